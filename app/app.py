@@ -282,18 +282,18 @@ with st.container(border=True):
 
         # Fallback gatherer if functions weren't exported in the module
         def _fallback_gather_connections(obj):
+            # explicit stack (children pushed reversed to keep document order)
             out = []
-            def rec(x):
-                if isinstance(x, dict):
-                    for k, v in x.items():
-                        if k == "Connections" and isinstance(v, str):
-                            out.append(v)
-                        else:
-                            rec(v)
+            stack = [obj] if isinstance(obj, (dict, list)) else []
+            while stack:
+                x = stack.pop()
+                if isinstance(x, str):
+                    out.append(x)
+                elif isinstance(x, dict):
+                    stack.extend(v for k, v in reversed(list(x.items()))
+                                 if isinstance(v, (dict, list)) or (k == "Connections" and isinstance(v, str)))
                 elif isinstance(x, list):
-                    for it in x:
-                        rec(it)
-            rec(obj)
+                    stack.extend(it for it in reversed(x) if isinstance(it, (dict, list)))
             return out
 
         # Decide which gatherer we’ll use
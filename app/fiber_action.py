@@ -1,7 +1,9 @@
 # helper.py
 from __future__ import annotations
 import io, re, math
-from typing import Dict, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+import numpy as np
 import pandas as pd
 from openpyxl import Workbook
 from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
@@ -15,146 +17,137 @@ CENTER = Alignment(horizontal="center", vertical="center")
 LEFT   = Alignment(horizontal="left",   vertical="center")
 
 
-def transform_fibre_action_summary_grid(wo_df: pd.DataFrame, meta: Dict) -> pd.DataFrame:
-    """
-    Produce a 4-column grid:
-        [Label_L, Value_L, Label_R, Value_R]
-    with rows matching your trace_action.csv layout.
-    """
-    if wo_df is None or wo_df.empty:
-        wo_df = pd.DataFrame()
-
-    # Derive columns we need
-    desc_col  = _try_col(wo_df, ["Description","DESC","Desc","description"]) or (wo_df.columns[0] if len(wo_df.columns) else None)
-    len_col   = _try_col(wo_df, ["Length", "End to End Length(m)", "End_to_End_Length_m"])
-    otdr_col  = _try_col(wo_df, ["~OTDR Length","OTDR Length","~OTDR Length(m)","otdr_length"])
-
-    # Counts
-    num_breaks, num_splices = (0, 0)
-    if desc_col:
-        try:
-            num_breaks, num_splices = _count_breaks_splices(wo_df, desc_col)
-        except Exception:
-            pass
-
-    # Lengths
-    end_to_end_len = None
-    otdr_len = None
-    if len_col and len_col in wo_df.columns:
-        vals = pd.to_numeric(wo_df[len_col], errors="coerce").dropna()
-        if len(vals):
-            end_to_end_len = int(vals.sum()) if len(vals) > 1 else int(vals.iloc[0])
-    if otdr_col and otdr_col in wo_df.columns:
-        vals = pd.to_numeric(wo_df[otdr_col], errors="coerce").dropna()
-        if len(vals):
-            otdr_len = int(vals.sum()) if len(vals) > 1 else int(vals.iloc[0])
-
-    # Pull meta (fallback to blanks)
-    order_id = meta.get("order_id", "")
-    wo_id    = meta.get("wo_id", "")
-    designer = meta.get("designer_name", "")
-    phone    = meta.get("designer_phone", "")
-    date     = meta.get("date", "")
-    a_end    = meta.get("a_end", "")
-    z_end    = meta.get("z_end", "")
-    details  = meta.get("details", "OSP DF")
-
-    grid = [
-        ["Order Number:",            order_id,                 "Number of Fibre Breaks:",   num_breaks or 0],
-        ["Work Order Number:",       wo_id,                    "Number of Fibre Splices",   num_splices or 0],
-        ["Order A to Z:",            f"_{a_end}_{z_end}" if a_end and z_end else "",  "End to End Length(m)",   end_to_end_len or 0],
-        ["Designer:",                designer,                 "End to End ~ OTDR(m)",      otdr_len or 0],
-        ["Contact Number:",          phone,                    "A END:",                    a_end],
-        ["Date (dd/mm/yyyy):",       date,                     "Z END:",                    z_end],
-        ["Details:",                 details,                  None,                        None],
-        ["ORDER Number:",            order_id,                 None,                        None],
-    ]
-
-    # pad to a fixed height (like your sample which had blank rows beneath)
-    while len(grid) < 21:
-        grid.append([None, None, None, None])
-
-    out = pd.DataFrame(grid, columns=["Order Number: ", "ORDER-267175", "Number of Fibre Breaks: ", "6"])
-    return out
-
 def read_actions_from_wo_file(uploaded_file) -> pd.DataFrame:
     raw = pd.read_csv(uploaded_file, header=None, dtype=str)
     raw.columns = range(raw.shape[1])
 
-    hdr_idx = raw.index[raw[0].astype(str).str.strip().eq("Action")]
-    if len(hdr_idx) == 0:
+    # positions, not labels: read with dtype=str, so no astype(str) round trip
+    hdr_pos = np.flatnonzero(raw[0].str.strip().eq("Action").to_numpy())
+    if len(hdr_pos) == 0:
         return pd.DataFrame(columns=["Action", "Description", "SAP"])
-    start = int(hdr_idx[0]) + 1
 
-    sub = raw.loc[start:, [0, 1, 2]].copy()
+    sub = raw.iloc[int(hdr_pos[0]) + 1:, [0, 1, 2]]
     sub.columns = ["Action", "Description", "SAP"]
-    stop_mask = sub.isna().all(axis=1)
-    if stop_mask.any():
-        sub = sub.loc[: stop_mask.idxmax() - 1]
+    # stop at the first fully blank row
+    blank = sub.isna().all(axis=1).to_numpy()
+    if blank.any():
+        sub = sub.iloc[: int(np.argmax(blank))]
 
     sub = sub.fillna("")
     return sub
-    t = _strip_markup(s)
-    # split on common separators and dedupe while keeping order
-    parts = re.split(r"\s[-:]\s| ; | , ", t)
-    parts = [p.strip() for p in parts if p and p.strip() != "."]
-    seen, uniq = set(), []
-    for p in parts:
-        k = p.lower()
-        if k not in seen:
-            seen.add(k)
-            uniq.append(p)
-
-    # shorten verbose phrases frequently seen in source
-    short = []
-    for p in uniq:
-        p2 = p
-        p2 = re.sub(r"\bBeanfield Manhole/Handwell\b", "BF Manhole/Handwell", p2, flags=re.I)
-        p2 = re.sub(r"\bUtility Pole (Wood|Concrete) With Splice Box\b",
-                    r"Utility Pole (\1) + Splice Box", p2, flags=re.I)
-        p2 = re.sub(r"\bHydro Manhole with Splice Box\b", "Hydro MH + Splice Box", p2, flags=re.I)
-        p2 = re.sub(r"\bGeneric OSP Splice Box\b", "OSP Splice Box", p2, flags=re.I)
-        p2 = re.sub(r"\bAddress[: ]", "", p2, flags=re.I)
-        p2 = re.sub(r"\bToronto[, ]*", "", p2, flags=re.I)
-        p2 = re.sub(r"\([^)]*\)", "", p2).strip()  # drop coords / parentheses
-        short.append(p2)
-
-    out = " | ".join([p for p in short if p])
-    return re.sub(r"\s{2,}", " ", out).strip(" |")
 
-def add_simplified_description(df: pd.DataFrame) -> pd.DataFrame:
-    # pick the description column if named differently
-    for cand in ["Description", "description", "DESC", "Desc", "Notes", "details", "Details"]:
-        if cand in df.columns:
-            desc_col = cand
-            break
-    else:
-        desc_col = "Description"
-        if desc_col not in df.columns:
-            df[desc_col] = ""
 
-    df["Description"] = df[desc_col]  # normalize name for preview
-    df["Description_simplified"] = df[desc_col].apply(simplify_description)
+_DESC_CANDIDATES = ("Description", "description", "DESC", "Desc", "Notes", "details", "Details")
+
+def add_simplified_description(df: pd.DataFrame) -> pd.DataFrame:
+    # pick the description column if named differently (one set build, O(1) probes)
+    cols = frozenset(df.columns)
+    desc_col = next((c for c in _DESC_CANDIDATES if c in cols), None)
+    if desc_col is None:
+        # nothing to simplify: both columns are just blank
+        df["Description"] = ""
+        df["Description_simplified"] = ""
+        return df
+
+    if desc_col != "Description":
+        df["Description"] = df[desc_col]  # normalize name for preview
+    # few distinct values -> store as category codes instead of one string per row
+    df["Description_simplified"] = _per_unique(df[desc_col], simplify_description_series).astype("category")
     return df
 
+def _per_unique(col: pd.Series, fn) -> pd.Series:
+    """
+    Apply a column-wise fn to the distinct values of col only and broadcast
+    the result back. WO descriptions repeat a lot, so this cuts regex work.
+    """
+    codes, uniques = pd.factorize(col)
+    # trailing slot holds fn's result for missing values (code -1)
+    done = fn(pd.Series(uniques, dtype=object)).tolist()
+    done.append(fn(pd.Series([None], dtype=object)).iloc[0])
+    return pd.Series(np.asarray(done, dtype=object)[codes], index=col.index)
+
+def simplify_description_series(col: pd.Series) -> pd.Series:
+    # same steps as simplify_description, run column-wise by pandas
+    s = col.where(col.notna(), "").astype(str).str.strip()
+    return (s.str.replace(_RX_PAREN, "", regex=True)
+             .str.replace(_RX_CLEAN, _clean_repl, regex=True)
+             .str.replace(_RX_SPACING, _spacing_repl, regex=True)
+             .str.strip(" ,;-"))
+
+_BOMS = (
+    (b"\xef\xbb\xbf", "utf-8-sig"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\xfe\xff", "utf-16"),
+)
+
+def _sniff_encoding(sample: bytes) -> str:
+    # BOM check only; anything else that isn't UTF-8 is read as latin-1
+    for bom, enc in _BOMS:
+        if sample.startswith(bom):
+            return enc
+    return "latin-1"
+
 def read_uploaded_table(up_file) -> pd.DataFrame:
     """Robust CSV reader used by other generators in your app.
     Accepts a file-like object from st.file_uploader.
+    Parses the stream directly as UTF-8; only a decode failure triggers a
+    second read, with the encoding picked from the first 64 KB.
     """
     up_file.seek(0)
-    content = up_file.read()
-    # Try UTF-8, then latin-1 as fallback
-    for enc in ("utf-8", "latin-1"):
+    enc = None
+    try:
+        return pd.read_csv(up_file, encoding="utf-8")
+    except UnicodeDecodeError:
+        up_file.seek(0)
+        enc = _sniff_encoding(up_file.read(65536))
+    except Exception:
+        pass
+    if enc:
+        up_file.seek(0)
         try:
-            return pd.read_csv(io.BytesIO(content), encoding=enc)
+            return pd.read_csv(up_file, encoding=enc)
         except Exception:
-            continue
+            pass
     # Last resort: excel sniff
     up_file.seek(0)
-    return pd.read_excel(io.BytesIO(content))
+    return pd.read_excel(up_file)
+
+# Patterns used by simplify_description (compiled once, not per row)
+# parentheses go first: the label strip has to see the text without them
+_RX_PAREN  = re.compile(r"\([^)]*\)")
+_RX_DROP   = re.compile(r"\b(?:Toronto|Address|PMID|Aptum ID)\s*:?\s*", re.I)
+# separators become ", ", other whitespace runs collapse to " " -> one pass
+_RX_SPACING = re.compile(r"(?P<punct>\s*[,;|]\s*)|\s{2,}")
+
+def _spacing_repl(m):
+    return ", " if m.group("punct") is not None else " "
+
+# <TOKEN> placeholders from the export -> replacement text
+_TOK = {"COMMA": ", ", "COLON": ": ", "AND": " & ", "OPEN": "", "CLOSE": ""}
+_RX_TOK = re.compile(r"<(COMMA|COLON|AND|OPEN|CLOSE)>")
+
+def _tok_repl(m):
+    return _TOK[m.group(1)]
+
+# label drop + token replacement fused into one scan (spacing still needs its
+# own pass since it has to see the separators the tokens produce)
+# (tokens stay case-sensitive; only the drop part ignores case)
+_RX_CLEAN = re.compile(f"(?i:{_RX_DROP.pattern})|{_RX_TOK.pattern}")
+
+def _clean_repl(m):
+    tok = m.group(1)
+    return "" if tok is None else _TOK[tok]
 
 # Replace your simplify_description with this improved version:
+# (cached: the app maps it over WO descriptions, which repeat a lot)
+@lru_cache(maxsize=4096)
 def simplify_description(text: str) -> str:
+    """
+    Strip coords/IDs in parentheses, noisy labels and export tokens.
+
+    >>> simplify_description("Address (x): foo")
+    'foo'
+    """
     if pd.isna(text):
         return ""
     s = str(text).strip()
@@ -162,21 +155,13 @@ def simplify_description(text: str) -> str:
         return ""
 
     # Remove GPS coords, parentheses with only coords or IDs
-    s = re.sub(r"\([^)]*\)", "", s)
-
-    # Drop common noisy labels
-    s = re.sub(r"\b(Toronto|Address|PMID|Aptum ID)\s*:?\s*", "", s, flags=re.I)
+    s = _RX_PAREN.sub("", s)
 
-    # Replace custom tokens
-    s = (s.replace("<COMMA>", ", ")
-          .replace("<COLON>", ": ")
-          .replace("<AND>", " & ")
-          .replace("<OPEN>", "")
-          .replace("<CLOSE>", ""))
+    # Drop common noisy labels, replace custom tokens
+    s = _RX_CLEAN.sub(_clean_repl, s)
 
     # Normalize punctuation/spacing
-    s = re.sub(r"\s*[,;|]\s*", ", ", s)
-    s = re.sub(r"\s{2,}", " ", s)
+    s = _RX_SPACING.sub(_spacing_repl, s)
     s = s.strip(" ,;-")
 
     return s
@@ -219,6 +204,31 @@ def normalize_description_to_pair(text: str) -> str:
         # Splice, keep order: A then B
         return f"Splice {a_id} {_fmt_span(a1,a2)} {b_id} {_fmt_span(b1,b2)}"
 
+def _int_str(col: pd.Series) -> pd.Series:
+    # str(int(x)) for digit strings, without the per-row int()
+    return col.str.lstrip("0").replace("", "0")
+
+def normalize_description_to_pair_series(col: pd.Series) -> pd.Series:
+    """
+    Column-wise normalize_description_to_pair: one str.extract over the whole
+    column instead of a regex match per row. Same output as mapping the scalar.
+    """
+    s = col.where(col.notna(), "").astype(str).str.strip()
+    out = s.where(s.str.lower().ne("none"), "")
+
+    parts = s.str.replace("–", "-", regex=False).str.extract(_RX_PAIR)
+    hit = parts["kind"].notna()
+    if not hit.any():
+        return out
+
+    p = parts.loc[hit]
+    a = p["a_id"] + " [" + _int_str(p["a1"]) + "-" + _int_str(p["a2"]) + "]"
+    b = p["b_id"] + " [" + _int_str(p["b1"]) + "-" + _int_str(p["b2"]) + "]"
+    is_break = p["kind"].str.lower().str.startswith("remove")
+    # BREAK reverses order (B then A); Splice keeps A then B
+    out.loc[hit] = np.where(is_break, "BREAK " + b + " " + a, "Splice " + a + " " + b)
+    return out
+
 def transform_fibre_action_actions(wo_df: pd.DataFrame) -> pd.DataFrame:
 
     """
@@ -226,72 +236,81 @@ def transform_fibre_action_actions(wo_df: pd.DataFrame) -> pd.DataFrame:
     (Uses the header-finder you already added.)
     """
     # treat wo_df as raw grid; find the real header row where col0='Action' & col1='Description'
-    raw = pd.DataFrame(wo_df.values)
-    raw.columns = range(raw.shape[1])
-
-    hdr_idx = raw.index[
-        raw.get(0).astype(str).str.strip().eq("Action") &
-        raw.get(1).astype(str).str.strip().eq("Description")
-    ]
-    if len(hdr_idx) == 0:
-        # case-insensitive fallback
-        hdr_idx = raw.index[
-            raw.get(0).astype(str).str.fullmatch(r"\s*Action\s*", case=False, na=False) &
-            raw.get(1).astype(str).str.fullmatch(r"\s*Description\s*", case=False, na=False)
-        ]
-    if len(hdr_idx) == 0:
+    # relabel columns 0..n-1 on a shallow copy (no cell data is copied)
+    raw = wo_df.copy(deep=False)
+    raw.columns = range(wo_df.shape[1])
+
+    # case-insensitive header match, plain string equality (no regex)
+    col0 = raw[0].astype(str).str.strip().str.lower()
+    col1 = raw[1].astype(str).str.strip().str.lower()
+    hdr_pos = np.flatnonzero(((col0 == "action") & (col1 == "description")).to_numpy())
+    if len(hdr_pos) == 0:
         return pd.DataFrame(columns=["Action", "Description", "SAP"])
 
-    start = int(hdr_idx[0]) + 1
-    sub = raw.loc[start:, [0, 1, 2]].copy()
+    start = int(hdr_pos[0]) + 1
+    sub = raw.iloc[start:, [0, 1, 2]]
     sub.columns = ["Action", "Description", "SAP"]
 
     # trim trailing blank block
     sub = sub.fillna("")
-    mask_keep = ~(
-        sub["Action"].astype(str).str.strip().eq("") &
-        sub["Description"].astype(str).str.strip().eq("") &
-        sub["SAP"].astype(str).str.strip().eq("")
-    )
+    stripped = sub.astype(str).apply(lambda c: c.str.strip())
+    mask_keep = stripped.ne("").any(axis=1)
     sub = sub.loc[mask_keep]
 
     # normalize Description to your compact format
-    sub["Description"] = sub["Description"].map(normalize_description_to_pair)
+    sub["Description"] = _per_unique(sub["Description"], normalize_description_to_pair_series)
 
     # ensure Action numbering prefix like '1: Add' remains (or generate if missing)
-    if not sub["Action"].astype(str).str.match(r"^\s*\d+:\s").any():
-        sub["Action"] = [f"{i+1}: {a if str(a).strip() else 'Add'}"
-                         for i, a in enumerate(sub["Action"].astype(str).str.strip())]
+    acts = sub["Action"].astype(str)
+    if not acts.str.match(r"^\s*\d+:\s").any():
+        acts = acts.str.strip()
+        seq = pd.Series(range(1, len(acts) + 1), index=acts.index).astype(str)
+        sub["Action"] = seq + ": " + acts.mask(acts.eq(""), "Add")
 
     if "SAP" not in sub.columns:
         sub["SAP"] = ""
 
     return sub[["Action", "Description", "SAP"]].reset_index(drop=True)
 
+_WIDTH_SAMPLE = 5000
+
 def _auto_widths(ws, df, min_w=8, max_w=60, pad=2):
-    # Auto size each column using header + longest cell length
+    # Auto size each column using header + longest cell length.
+    # Only the first _WIDTH_SAMPLE rows are measured: widths are capped at
+    # max_w anyway, so scanning every row of a huge sheet buys nothing.
+    sample = df.head(_WIDTH_SAMPLE)
     for col_idx, col_name in enumerate(df.columns):
         header_w = len(str(col_name))
-        data_w = 0 if df.empty else int(df[col_name].astype(str).map(len).max())
+        data_w = 0 if df.empty else int(sample[col_name].astype(str).str.len().max() or 0)
         width = max(header_w, data_w) + pad
         ws.set_column(col_idx, col_idx, max(min_w, min(width, max_w)))
 
+def _write_frame(book, sheet_name, df):
+    # to_excel writes column by column, which constant_memory can't take;
+    # write the header + rows ourselves (NaN/None -> blank cell, like to_excel)
+    ws = book.add_worksheet(sheet_name)
+    ws.write_row(0, 0, [str(c) for c in df.columns])
+    vals = df.astype(object).where(df.notna(), None).to_numpy()
+    for i, row in enumerate(vals.tolist(), start=1):  # +1 for header row
+        ws.write_row(i, 0, row)
+    _auto_widths(ws, df)
+    return ws
+
 def fibre_action_excel_bytes(summary_df: pd.DataFrame,
                              actions_df: pd.DataFrame,
                              title: str = "fibre_action") -> bytes:
     """
     Two sheets ('Summary', 'Fibre Action'), no styling, only auto-width columns.
+    Written in constant_memory mode, row by row, so rows stream out instead of
+    being held until save. Strings are written as-is (no URL sniffing per cell).
     """
     bio = io.BytesIO()
-    # NOTE: no 'options=' here to avoid the ExcelWriter.new() error
-    with pd.ExcelWriter(bio, engine="xlsxwriter") as writer:
-        summary_df.to_excel(writer, sheet_name="Summary", index=False)
-        actions_df.to_excel(writer, sheet_name="Fibre Action", index=False)
-
-        ws1 = writer.sheets["Summary"]
-        ws2 = writer.sheets["Fibre Action"]
-        _auto_widths(ws1, summary_df)
-        _auto_widths(ws2, actions_df)
+    # options go through engine_kwargs (passing options= directly raises in ExcelWriter.new())
+    with pd.ExcelWriter(bio, engine="xlsxwriter",
+                        engine_kwargs={"options": {"constant_memory": True,
+                                                   "strings_to_urls": False}}) as writer:
+        _write_frame(writer.book, "Summary", summary_df)
+        _write_frame(writer.book, "Fibre Action", actions_df)
 
         # (Optional) title metadata—safe to ignore if unsupported
         try:
@@ -302,22 +321,38 @@ def fibre_action_excel_bytes(summary_df: pd.DataFrame,
     bio.seek(0)
     return bio.getvalue()
     
+_LEN_CANDIDATES = ("Length", "End to End Length(m)", "End_to_End_Length_m")
+_OTDR_CANDIDATES = ("~OTDR Length", "OTDR Length", "~OTDR Length(m)", "otdr_length")
+
 def transform_fibre_action_summary_grid(wo_df: pd.DataFrame, meta: dict) -> pd.DataFrame:
     """
     Return a 2-column key/value DataFrame for the Summary tab.
-    Overwrites the old 4-column layout.
+    (Replaces the old 4-column layout.)
     """
     # Derive counts if possible
-    desc_col = None
-    for c in wo_df.columns:
-        if "desc" in c.lower():
-            desc_col = c
-            break
+    desc_col = next((c for c in wo_df.columns if "desc" in str(c).lower()), None)
+    cols = frozenset(wo_df.columns)
+    len_col = next((c for c in _LEN_CANDIDATES if c in cols), None)
+    otdr_col = next((c for c in _OTDR_CANDIDATES if c in cols), None)
     breaks = splices = 0
-    if desc_col:
-        s = wo_df[desc_col].astype(str)
-        breaks = s.str.contains("Remove", case=False, na=False).sum()
-        splices = s.str.contains("Splice", case=False, na=False).sum()
+    if desc_col is not None:
+        # lower-case once, then plain substring tests (no regex compile);
+        # the two counts are independent, a row can be both a break and a splice
+        s = wo_df[desc_col].astype(str).str.lower()
+        breaks = int(s.str.contains("remove", regex=False).sum())
+        splices = int(s.str.contains("splice", regex=False).sum())
+
+    # Lengths (0 when the WO has no length columns)
+    end_to_end_len = otdr_len = 0
+    # sum(min_count=1) skips NaN in place and stays NaN when nothing is numeric
+    if len_col is not None:
+        total = pd.to_numeric(wo_df[len_col], errors="coerce").sum(min_count=1)
+        if pd.notna(total):
+            end_to_end_len = int(total)
+    if otdr_col is not None:
+        total = pd.to_numeric(wo_df[otdr_col], errors="coerce").sum(min_count=1)
+        if pd.notna(total):
+            otdr_len = int(total)
 
     # Meta values
     order_id = meta.get("order_id", "")
@@ -340,8 +375,8 @@ def transform_fibre_action_summary_grid(wo_df: pd.DataFrame, meta: dict) -> pd.D
         ("Details:", details),
         ("Number of Fibre Breaks", breaks),
         ("Number of Fibre Splices", splices),
-        ("End to End Length(m)", 0),
-        ("End to End ~ OTDR(m)", 0),
+        ("End to End Length(m)", end_to_end_len),
+        ("End to End ~ OTDR(m)", otdr_len),
         ("A END:", a_end),
         ("Z END:", z_end),
     ]
@@ -349,8 +384,6 @@ def transform_fibre_action_summary_grid(wo_df: pd.DataFrame, meta: dict) -> pd.D
     return pd.DataFrame(rows, columns=["Field", "Value"])
 
 
-from typing import Dict, Any, List
-
 def _dig_number(container: dict, *paths: str, default: float = 0.0) -> float:
     """
     Try several dot-paths inside the JSON to find a numeric value.
@@ -251,8 +251,9 @@ def write_styled_excel(df: pd.DataFrame, urls, out_xlsx: Path, sheet="Sheet1"):
         # Red+bold format for 'Equipment Location' rows
         fmt_loc = wb.add_format({"bold": True, "font_color": "white", "bg_color": "#D32F2F"})
         col_map = df.columns.get_loc("Map It")
-        for r in range(nrows):
-            is_loc = (df.iat[r, 0] == "Equipment Location")
+        # one vectorized compare instead of a df.iat lookup per row
+        loc_rows = df.iloc[:, 0].eq("Equipment Location").to_numpy()
+        for r, is_loc in enumerate(loc_rows):
             if is_loc:
                 ws.set_row(r + 1, None, fmt_loc)      # +1 to skip header row
                 if urls[r]:
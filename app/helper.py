@@ -1,14 +1,14 @@
-import re, json, io, math, os, tempfile
+import re, json, io, math, os, tempfile, csv
 from io import BytesIO
+import numpy as np
 import pandas as pd
 from datetime import date, datetime
 import streamlit as st
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
+import xlsxwriter
 
 
-def simple_workbook_bytes(meta: dict, wo_df: pd.DataFrame, details_df: pd.DataFrame) -> bytes:
+def simple_workbook_bytes(meta: dict, wo_df: pd.DataFrame, details_df: pd.DataFrame, as_bytes: bool = True):
+    """Meta/WO/Details dump. Returns bytes, or the rewound BytesIO when as_bytes=False."""
     if details_df is None or not hasattr(details_df, "to_excel"):
         details_df = pd.DataFrame()
     buf = io.BytesIO()
@@ -17,20 +17,25 @@ def simple_workbook_bytes(meta: dict, wo_df: pd.DataFrame, details_df: pd.DataFr
         pd.DataFrame([meta]).to_excel(writer, index=False, sheet_name="Meta")
         wo_df.to_excel(writer, index=False, sheet_name="WO")
         details_df.to_excel(writer, index=False, sheet_name="Details")
-    buf.seek(0)
+    if not as_bytes:
+        buf.seek(0)
+        return buf
     return buf.getvalue()
 
 # Dynamically set the title based on the uploaded CSV's Work Order number
 def get_work_order_number(up_wo_csv):
     try:
         if up_wo_csv is not None:
-            df = pd.read_csv(up_wo_csv)
+            # Sniff the header only, then read just the first cell of the matching column
+            header = pd.read_csv(up_wo_csv, nrows=0).columns
             # Try common column names for work order number
-            for col in ["Work Order", "Work Order #", "WO", "WO Number"]:
-                if col in df.columns:
-                    val = str(df[col].iloc[0])
-                    if val.strip():
-                        return val.strip()
+            col = next((c for c in ["Work Order", "Work Order #", "WO", "WO Number"] if c in header), None)
+            if col is not None:
+                if hasattr(up_wo_csv, "seek"):
+                    up_wo_csv.seek(0)
+                val = str(pd.read_csv(up_wo_csv, usecols=[col], nrows=1, dtype=str)[col].iloc[0])
+                if val.strip():
+                    return val.strip()
     except Exception:
         pass
     return "WO24218"
@@ -41,9 +46,11 @@ def normalize_excel_output(x, *, fallback_meta=None, fallback_wo=None, fallback_
     Returns (bytes, ext, mime). Tries x first; if unusable, falls back to simple .xlsx.
     ext in {'.xlsx', '.xlsm'} with matching MIME.
     """
-    # 1) If already bytes
+    # 1) If already bytes (or an in-memory buffer from as_bytes=False)
     if isinstance(x, (bytes, bytearray)):
         return bytes(x), ".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    if isinstance(x, io.BytesIO):
+        return x.getvalue(), ".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
     # 2) openpyxl workbook (with/without macros)
     try:
@@ -53,7 +60,6 @@ def normalize_excel_output(x, *, fallback_meta=None, fallback_wo=None, fallback_
             has_vba = getattr(x, "vba_archive", None) is not None
             buf = io.BytesIO()
             x.save(buf)        # IMPORTANT: save() writes and closes internal state
-            buf.seek(0)
             return (
                 buf.getvalue(),
                 ".xlsm" if has_vba else ".xlsx",
@@ -78,12 +84,11 @@ def normalize_excel_output(x, *, fallback_meta=None, fallback_wo=None, fallback_
         buf = io.BytesIO()
         with pd.ExcelWriter(buf, engine="xlsxwriter") as w:
             x.to_excel(w, index=False, sheet_name="Sheet1")
-        buf.seek(0)
         return buf.getvalue(), ".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
     # 5) Nothing usable → fallback to a minimal valid .xlsx
     if fallback_meta is not None and fallback_wo is not None:
-        b = simple_workbook_bytes(fallback_meta, fallback_wo, fallback_details or pd.DataFrame())
+        b = simple_workbook_bytes(fallback_meta, fallback_wo, fallback_details)
         return b, ".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
     # If we get here, signal error up the stack
@@ -113,230 +118,238 @@ def require_inputs(up_wo_csv, up_json):
 
     return wo_df, payload
 
-def _try_col(df: pd.DataFrame, names):
-    for n in names:
-        if n in df.columns:
-            return n
-    return None
+def _try_col(df, names):
+    """First of `names` present in df's columns. `df` may also be a prebuilt column set."""
+    cols = df.columns if isinstance(df, pd.DataFrame) else df
+    return next((n for n in names if n in cols), None)
+
+def _meta_cell(v):
+    """Meta value as something write() accepts: scalars pass, None/NaN blank, rest str()."""
+    if v is None or isinstance(v, (str, bool, int, float, date)):
+        return None if pd.isna(v) else v
+    if isinstance(v, np.datetime64):
+        return _meta_cell(pd.Timestamp(v))
+    if isinstance(v, np.generic):
+        return _meta_cell(v.item())
+    return str(v)
+
+# same prefixes the startswith checks accepted (not fully case-insensitive)
+_BREAK_SPLICE_RE = re.compile(r"^\s*(BREAK|Break|Splice|splice)")
 
 def count_breaks_and_splices(df: pd.DataFrame, desc_col: str):
-    breaks = int(df[desc_col].astype(str).str.strip().str.startswith(("BREAK", "Break")).sum())
-    splices = int(df[desc_col].astype(str).str.strip().str.startswith(("Splice", "splice")).sum())
-    return breaks, splices
+    # one regex scan classifies every row, then a single tally
+    kinds = df[desc_col].astype(str).str.extract(_BREAK_SPLICE_RE, expand=False).str.lower().value_counts()
+    return int(kinds.get("break", 0)), int(kinds.get("splice", 0))
+
+# Keys whose values are bulk text blobs (splice reports, raw dumps) and never hold A/Z ends
+_ENDPOINT_SKIP_KEYS = frozenset({"connections", "payload_raw", "raw", "html"})
 
 def parse_endpoints_from_json(payload: dict):
     """
     Best-effort: looks for A/Z end strings in common keys.
+    Iterative depth-first walk (document order) that stops once both ends are found.
     """
-    # Flatten once
-    flat = {}
-    def walk(x, prefix=""):
-        if isinstance(x, dict):
-            for k, v in x.items():
-                walk(v, f"{prefix}.{k}" if prefix else k)
-        elif isinstance(x, list):
-            for i, v in enumerate(x):
-                walk(v, f"{prefix}[{i}]")
-        else:
-            flat[prefix] = x
-    walk(payload)
-
-    # naive search
     a_end = None
     z_end = None
-    for k, v in flat.items():
-        ks = k.lower()
-        if isinstance(v, (str, int, float)):
-            vs = str(v).strip()
-            if a_end is None and ("a end" in ks or "a_end" in ks or ks.endswith(".a")):
+    # (node, A seen on path, Z seen on path, own key when nested under a dict)
+    stack = [(payload, False, False, None)]
+    while stack:
+        x, a_hit, z_hit, last = stack.pop()
+        if isinstance(x, dict):
+            nested = x is not payload  # top-level keys have no "." before them
+            for k, v in reversed(list(x.items())):
+                ks = str(k).lower()
+                if ks in _ENDPOINT_SKIP_KEYS:
+                    continue
+                stack.append((
+                    v,
+                    a_hit or "a end" in ks or "a_end" in ks,
+                    z_hit or "z end" in ks or "z_end" in ks,
+                    ks if nested else None,
+                ))
+        elif isinstance(x, list):
+            stack.extend((v, a_hit, z_hit, None) for v in reversed(x))
+        elif isinstance(x, (str, int, float)):
+            vs = str(x).strip()
+            if a_end is None and (a_hit or last == "a"):
                 a_end = vs
-            if z_end is None and ("z end" in ks or "z_end" in ks or ks.endswith(".z")):
+            if z_end is None and (z_hit or last == "z"):
                 z_end = vs
+            if a_end is not None and z_end is not None:
+                break
     return a_end, z_end
 
-def build_excel(meta: dict, wo_df: pd.DataFrame, details_df: pd.DataFrame, payload_json: dict) -> bytes:
+def build_excel(meta: dict, wo_df: pd.DataFrame, details_df: pd.DataFrame, payload_json: dict, as_bytes: bool = True):
     """
-    Creates the Excel with two sheets:
+    Creates the Excel with these sheets:
       - Summary (header block + action table)
       - Details (details_df + 'Map It' hyperlinks when lat/lon available)
+      - Meta / WO (the raw meta dict and WO table)
+    Written with a single xlsxwriter workbook in constant_memory mode, so
+    every sheet is emitted strictly row by row.
+    Returns bytes, or the rewound BytesIO when as_bytes=False (e.g. to hand
+    straight to st.download_button).
     """
 
     if details_df is None or not hasattr(details_df, "copy"):
         details_df = pd.DataFrame()
 
     buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
-        # --- write your sheets here ---
-        pd.DataFrame([meta]).to_excel(writer, index=False, sheet_name="Meta")
-        wo_df.to_excel(writer, index=False, sheet_name="WO")
-
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Summary"
-
-        # Styles
-        hfill = PatternFill("solid", fgColor="D9D9D9")
-        bold = Font(bold=True)
-        thin = Side(border_style="thin", color="AAAAAA")
-        box = Border(left=thin, right=thin, top=thin, bottom=thin)
-        center = Alignment(horizontal="center", vertical="center")
-        left = Alignment(horizontal="left", vertical="center")
-
-        # ---------- Header block ----------
-        # Derive counts and lengths
-        desc_col = _try_col(wo_df, ["Description", "description", "DESC", "Desc"]) or wo_df.columns[0]
-        action_col = _try_col(wo_df, ["Action", "ACTION", "Wo Action#", "WO Action#"]) or wo_df.columns[0]
-
-        num_breaks, num_splices = count_breaks_and_splices(wo_df, desc_col)
-
-        # lengths best‑effort: if single big numbers exist, use them; else sum
-        end_to_end_len = None
-        otdr_len = None
-        len_col = _try_col(wo_df, ["Length", "length", "End to End Length(m)", "End_to_End_Length_m"])
-        otdr_col = _try_col(wo_df, ["~OTDR Length", "~OTDR Length(m)", "OTDR Length", "otdr_length"])
-
-        if len_col:
-            try:
-                vals = pd.to_numeric(wo_df[len_col], errors="coerce").dropna()
-                end_to_end_len = int(vals.sum()) if len(vals) > 1 else int(vals.iloc[0])
-            except:
-                end_to_end_len = None
-        if otdr_col:
-            try:
-                vals = pd.to_numeric(wo_df[otdr_col], errors="coerce").dropna()
-                otdr_len = int(vals.sum()) if len(vals) > 1 else int(vals.iloc[0])
-            except:
-                otdr_len = None
-
-        # A/Z ends from JSON (fallback to meta)
-        a_end_json, z_end_json = parse_endpoints_from_json(payload_json or {})
-        a_end = a_end_json or meta.get("a_end")
-        z_end = z_end_json or meta.get("z_end")
-
-        # Header grid values (match your screenshot text)
-        left_labels = [
-            ("Order Number:", meta.get("order_id")),
-            ("Work Order Number:", meta.get("wo_id")),
-            ("Order A to Z:", f"{a_end}_{z_end}" if a_end and z_end else ""),
-            ("Designer:", meta.get("designer_name")),
-            ("Contact Number:", meta.get("designer_phone")),
-            ("Date (dd/mm/yyyy):", meta.get("date")),
-            ("Details:", meta.get("details")),
-            ("ORDER Number:", meta.get("order_id")),
+    wb = xlsxwriter.Workbook(buf, {"constant_memory": True, "strings_to_urls": False})
+    summary = wb.add_worksheet("Summary")
+    details = wb.add_worksheet("Details")
+    meta_ws = wb.add_worksheet("Meta")
+    wo_ws = wb.add_worksheet("WO")
+
+    # Formats (created once, shared by every cell)
+    vcenter = wb.add_format({"valign": "vcenter"})
+    bold = wb.add_format({"bold": True, "valign": "vcenter"})
+    hfill = wb.add_format({"bold": True, "bg_color": "#D9D9D9", "valign": "vcenter"})
+    hcenter = wb.add_format({"bold": True, "bg_color": "#D9D9D9", "align": "center", "valign": "vcenter"})
+
+    # ---------- Header block ----------
+    # Derive counts and lengths
+    wo_cols = frozenset(wo_df.columns)
+    desc_col = _try_col(wo_cols, ["Description", "description", "DESC", "Desc"]) or wo_df.columns[0]
+    action_col = _try_col(wo_cols, ["Action", "ACTION", "Wo Action#", "WO Action#"]) or wo_df.columns[0]
+
+    num_breaks, num_splices = count_breaks_and_splices(wo_df, desc_col)
+
+    # lengths best‑effort: if single big numbers exist, use them; else sum
+    end_to_end_len = None
+    otdr_len = None
+    len_col = _try_col(wo_cols, ["Length", "length", "End to End Length(m)", "End_to_End_Length_m"])
+    otdr_col = _try_col(wo_cols, ["~OTDR Length", "~OTDR Length(m)", "OTDR Length", "otdr_length"])
+
+    # sum(min_count=1) skips NaN in place and stays NaN when nothing is numeric
+    if len_col:
+        total = pd.to_numeric(wo_df[len_col], errors="coerce").sum(min_count=1)
+        end_to_end_len = int(total) if pd.notna(total) else None
+    if otdr_col:
+        total = pd.to_numeric(wo_df[otdr_col], errors="coerce").sum(min_count=1)
+        otdr_len = int(total) if pd.notna(total) else None
+
+    # A/Z ends from JSON (fallback to meta)
+    a_end_json, z_end_json = parse_endpoints_from_json(payload_json or {})
+    a_end = a_end_json or meta.get("a_end")
+    z_end = z_end_json or meta.get("z_end")
+
+    # Header grid values (match your screenshot text)
+    left_labels = [
+        ("Order Number:", meta.get("order_id")),
+        ("Work Order Number:", meta.get("wo_id")),
+        ("Order A to Z:", f"{a_end}_{z_end}" if a_end and z_end else ""),
+        ("Designer:", meta.get("designer_name")),
+        ("Contact Number:", meta.get("designer_phone")),
+        ("Date (dd/mm/yyyy):", meta.get("date")),
+        ("Details:", meta.get("details") or "OSP DF"),
+        ("ORDER Number:", meta.get("order_id")),
+    ]
+    right_labels = [
+        ("Number of Fibre Breaks:", num_breaks),
+        ("Number of Fibre Splices", num_splices),
+        ("End to End Length(m)", end_to_end_len),
+        ("End to End ~ OTDR(m)", otdr_len),
+        ("A END:", a_end),
+        ("Z END:", z_end),
+        ("Work Order Processing Results", ""),
+        ("# of WO Splice/Locations:", 0),
+        ("# of ACTION Splice/Locations:", 0),
+    ]
+
+    # width + looks (column format gives every cell vertical centering)
+    summary.set_column(0, 9, None, vcenter)
+    for col, width in [(0, 18), (1, 120), (8, 12), (9, 28)]:
+        summary.set_column(col, col, width, vcenter)
+
+    # write grid row by row: left label/value in A:B, right label/value in I:J
+    for r in range(max(len(left_labels), len(right_labels))):
+        if r < len(left_labels):
+            label, value = left_labels[r]
+            summary.write(r, 0, label, bold)
+            summary.write(r, 1, value)
+        if r < len(right_labels):
+            label, value = right_labels[r]
+            summary.write(r, 8, label, bold)
+            summary.write(r, 9, value)
+
+    # ---------- Actions table ----------
+    start_row = 9
+    summary.write_row(start_row, 0, ["Action", "Description", "", "", "", "", "", "", "SAP", ""], hfill)
+
+    # bring in only the two columns we care about
+    actions = wo_df[[c for c in [action_col, desc_col] if c in wo_df.columns]]  # column selection already returns a new frame
+    actions.columns = ["Action", "Description"]
+
+    # Sort numerically if action has a number at start (one vectorized extract, stable sort)
+    order = pd.to_numeric(
+        actions["Action"].astype(str).str.extract(r"^\s*(\d+)", expand=False), errors="coerce"
+    ).fillna(10**9).astype("int64")
+    actions = actions.iloc[order.argsort(kind="mergesort")]
+
+    # blank out NaN once for the whole block, then hand plain row lists to write_row
+    action_rows = actions.astype(object).where(actions.notna(), "").to_numpy().tolist()
+    for i, row in enumerate(action_rows, start=start_row + 1):
+        summary.write_row(i, 0, row)  # SAP blank per screenshot
+
+    # -------------------- Details sheet --------------------
+    df = details_df.astype(object).where(details_df.notna(), "")
+
+    # Add Map It hyperlink if we can find lat/lon
+    det_cols = frozenset(df.columns)
+    lat_col = _try_col(det_cols, ["lat", "Lat", "latitude", "Latitude", "LAT"])
+    lon_col = _try_col(det_cols, ["lon", "Lon", "lng", "Lng", "longitude", "Longitude", "LON"])
+
+    if lat_col and lon_col:
+        maps_col = "Map It"
+        df[maps_col] = ""
+        mc_index = df.columns.get_loc(maps_col)
+        # static URLs (no HYPERLINK formula for Excel to evaluate on open)
+        urls = [
+            f"https://www.google.com/maps?q={la},{lo}" if la != "" and lo != "" else None
+            for la, lo in zip(df[lat_col].tolist(), df[lon_col].tolist())
         ]
-        right_labels = [
-            ("Number of Fibre Breaks:", num_breaks),
-            ("Number of Fibre Splices", num_splices),
-            ("End to End Length(m)", end_to_end_len),
-            ("End to End ~ OTDR(m)", otdr_len),
-            ("A END:", a_end),
-            ("Z END:", z_end),
-            ("Work Order Processing Results", ""),
-            ("# of WO Splice/Locations:", 0),
-            ("# of ACTION Splice/Locations:", 0),
-        ]
-
-        # write grid (two columns of label/value repeated)
-        r = 1
-        for label, value in left_labels[:6]:
-            ws.cell(row=r, column=1, value=label).font = bold
-            ws.cell(row=r, column=2, value=value)
-            if r <= 4:  # first 4 rows have a matching right-side line
-                rl = right_labels[r-1]
-                ws.cell(row=r, column=9, value=rl[0]).font = bold
-                ws.cell(row=r, column=10, value=rl[1])
-            r += 1
-        # continue the remaining right labels beneath
-        start_r = 5
-        for i, (label, value) in enumerate(right_labels[4:], start=start_r):
-            ws.cell(row=i, column=9, value=label).font = bold
-            ws.cell(row=i, column=10, value=value)
-
-        # Last two left rows
-        ws.cell(row=7, column=1, value="Details:").font = bold
-        ws.cell(row=7, column=2, value=meta.get("details") or "OSP DF")
-        ws.cell(row=8, column=1, value="ORDER Number:").font = bold
-        ws.cell(row=8, column=2, value=meta.get("order_id"))
-
-        # ---------- Actions table ----------
-        start_row = 10
-        ws.cell(row=start_row, column=1, value="Action").font = bold
-        ws.cell(row=start_row, column=2, value="Description").font = bold
-        ws.cell(row=start_row, column=9, value="SAP").font = bold  # same columns as screenshot
-
-        # bring in only the two columns we care about
-        actions = wo_df[[c for c in [action_col, desc_col] if c in wo_df.columns]].copy()
-        actions.columns = ["Action", "Description"]
-
-        # Sort numerically if action has a number at start
-        def sort_key(x):
-            m = re.match(r"^\s*(\d+)", str(x))
-            return int(m.group(1)) if m else 10**9
-        actions = actions.sort_values(by="Action", key=lambda s: s.map(sort_key))
-
-        for i, (_, row) in enumerate(actions.iterrows(), start=start_row+1):
-            ws.cell(row=i, column=1, value=row["Action"])
-            ws.cell(row=i, column=2, value=row["Description"])
-            ws.cell(row=i, column=9, value="")  # SAP blank per screenshot
-
-        # width + looks
-        for col, width in [(1,18),(2,120),(9,12),(10,28)]:
-            ws.column_dimensions[get_column_letter(col)].width = width
-        for r in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=10):
-            for c in r:
-                c.alignment = Alignment(vertical="center")
-                if c.row == start_row:
-                    c.fill = hfill
-                    c.font = bold
-
-        # -------------------- Details sheet --------------------
-        ws2 = wb.create_sheet("Details")
-
-        df = details_df.copy()
-
-        # Add Map It hyperlink if we can find lat/lon
-        lat_col = _try_col(df, ["lat", "Lat", "latitude", "Latitude", "LAT"])
-        lon_col = _try_col(df, ["lon", "Lon", "lng", "Lng", "longitude", "Longitude", "LON"])
-
-        if lat_col and lon_col:
-            maps_col = "Map It"
-            df[maps_col] = ""
-        else:
-            maps_col = None
-
-        # Write header
-        for j, col in enumerate(df.columns, start=1):
-            ws2.cell(row=1, column=j, value=col).font = bold
-            ws2.cell(row=1, column=j).fill = hfill
-            ws2.cell(row=1, column=j).alignment = center
-
-        # Write rows
-        for i, row in enumerate(df.itertuples(index=False), start=2):
-            for j, val in enumerate(row, start=1):
-                ws2.cell(row=i, column=j, value=val)
-
-        # Insert hyperlinks
-        if maps_col:
-            mc_index = df.columns.get_loc(maps_col) + 1
-            lat_idx = df.columns.get_loc(lat_col) + 1
-            lon_idx = df.columns.get_loc(lon_col) + 1
-            for i in range(2, 2 + len(df)):
-                lat_cell = f"{get_column_letter(lat_idx)}{i}"
-                lon_cell = f"{get_column_letter(lon_idx)}{i}"
-                link = f'=HYPERLINK("https://www.google.com/maps?q="&{lat_cell}&","&{lon_cell},"Google Maps")'
-                ws2.cell(row=i, column=mc_index, value=link)
-
-        # basic widths
-        for j in range(1, ws2.max_column + 1):
-            ws2.column_dimensions[get_column_letter(j)].width = 24
-
-        # Return bytes
-        buf = BytesIO()
-        wb.save(buf)
-        return buf.read()
-    
-    buf.seek(0)
-    return buf.getvalue()       
+    else:
+        maps_col = None
+        urls = []
+
+    # basic widths
+    if len(df.columns):
+        details.set_column(0, len(df.columns) - 1, 24)
+
+    # Write header + rows. constant_memory flushes each finished row, so the
+    # data goes out row-major from one object array (no per-row namedtuples)
+    # rather than column by column.
+    details.write_row(0, 0, list(df.columns), hcenter)
+    for i, row in enumerate(df.to_numpy(dtype=object).tolist(), start=1):
+        details.write_row(i, 0, row)
+        if urls and urls[i - 1]:
+            details.write_url(i, mc_index, urls[i - 1], string="Google Maps")
+
+    # -------------------- Meta / WO sheets (raw inputs) --------------------
+    meta_ws.write_row(0, 0, [str(k) for k in meta.keys()], bold)
+    # dates get the same formats pandas' to_excel used; everything else as-is
+    date_fmt = wb.add_format({"num_format": "yyyy-mm-dd"})
+    datetime_fmt = wb.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+    for c, v in enumerate(meta.values()):
+        v = _meta_cell(v)
+        if isinstance(v, datetime):
+            meta_ws.write_datetime(1, c, v, datetime_fmt)
+        elif isinstance(v, date):
+            meta_ws.write_datetime(1, c, v, date_fmt)
+        elif v is not None:
+            meta_ws.write(1, c, v)
+
+    wo = wo_df.astype(object).where(wo_df.notna(), "")
+    wo_ws.write_row(0, 0, [str(c) for c in wo.columns], bold)
+    for i, row in enumerate(wo.to_numpy(dtype=object).tolist(), start=1):
+        wo_ws.write_row(i, 0, row)
+
+    wb.close()
+    if not as_bytes:
+        buf.seek(0)
+        return buf
+    return buf.getvalue()
 
 def read_uploaded_table(uploaded_file) -> pd.DataFrame:
     if uploaded_file is None:
@@ -349,6 +362,19 @@ def read_uploaded_table(uploaded_file) -> pd.DataFrame:
         bio.seek(0)
         return pd.read_excel(bio, engine="openpyxl")
 
+    # CSV fast path: sniff the dialect from the first line (what the python
+    # engine does internally) and hand it to the C parser
+    try:
+        first_line = data.split(b"\n", 1)[0].decode("utf-8", errors="ignore")
+        dialect = csv.Sniffer().sniff(first_line)
+        bio.seek(0)
+        return pd.read_csv(
+            bio, dialect=dialect, engine="c", on_bad_lines="skip",
+            encoding="utf-8", encoding_errors="ignore"
+        )
+    except Exception:
+        pass
+
     # CSV: autodetect delimiter + tolerant encodings
     for enc in ("utf-8", "utf-16", "latin1"):
         try:
@@ -364,9 +390,9 @@ def read_uploaded_table(uploaded_file) -> pd.DataFrame:
     return pd.read_excel(bio, engine="openpyxl")  # last resort
 
 def _guess_latlon_cols(df):
-    cols = {c.lower(): c for c in df.columns}
-    lat = next((cols[c] for c in ["lat","latitude","y","lat_dd"] if c in cols), None)
-    lon = next((cols[c] for c in ["lon","lng","longitude","x","lon_dd"] if c in cols), None)
+    cols = {str(c).lower(): c for c in df.columns}
+    lat = next((cols[c] for c in ("lat","latitude","y","lat_dd") if c in cols), None)
+    lon = next((cols[c] for c in ("lon","lng","longitude","x","lon_dd") if c in cols), None)
     return lat, lon
 
 def placemarks_from_wo_df(wo_df):
@@ -380,32 +406,39 @@ def placemarks_from_wo_df(wo_df):
         if any(k in cl for k in ["name","site","id","device","label","address","location"]):
             name_col = c; break
 
-    pms = []
-    for _, r in wo_df.iterrows():
-        try:
-            lat, lon = float(r[lat_col]), float(r[lon_col])
-        except Exception:
-            continue
-        if not (math.isfinite(lat) and math.isfinite(lon)):
-            continue
-        name = str(r[name_col]).strip() if name_col and pd.notna(r.get(name_col)) else "WO Point"
-        pms.append({"name": name, "lat": lat, "lon": lon, "description": ""})
-    return pms
+    # columnar: coerce coordinates once, keep only finite pairs
+    lat = pd.to_numeric(wo_df[lat_col], errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(wo_df[lon_col], errors="coerce").to_numpy(dtype=float)
+    mask = np.isfinite(lat) & np.isfinite(lon)
+    if name_col:
+        names = wo_df[name_col].astype(str).str.strip().where(wo_df[name_col].notna(), "WO Point")
+        names = names.to_numpy(dtype=object)[mask]
+    else:
+        names = ["WO Point"] * int(mask.sum())
+
+    return [
+        {"name": name, "lat": float(la), "lon": float(lo), "description": ""}
+        for name, la, lo in zip(names, lat[mask], lon[mask])
+    ]
 
-def placemarks_from_payload(payload):
 # parses lines like: "... Address: ... () : 43.644719, -79.385046 :  : something"
-    _COORD_RE = re.compile(r":\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*:\s*:\s*(.*)$")
-    # Walk JSON to collect candidate strings
-    texts=[]
-    def walk(x):
-        if isinstance(x, dict):
-            for v in x.values(): walk(v)
+_COORD_RE = re.compile(r":\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*:\s*:\s*(.*)$")
+
+def _iter_strings(obj):
+    """Yield every string leaf in a JSON object, depth-first in document order."""
+    stack = [obj]
+    while stack:
+        x = stack.pop()
+        if isinstance(x, str):
+            yield x
+        elif isinstance(x, dict):
+            stack.extend(reversed(list(x.values())))
         elif isinstance(x, list):
-            for v in x: walk(v)
-        elif isinstance(x, str):
-            if "Address:" in x and ":" in x:
-                texts.append(x)
-    walk(payload)
+            stack.extend(reversed(x))
+
+def placemarks_from_payload(payload):
+    # Walk JSON to collect candidate strings
+    texts = [x for x in _iter_strings(payload) if "Address:" in x and ":" in x]
 
     pms=[]
     for blob in texts:
@@ -424,6 +457,19 @@ def placemarks_from_payload(payload):
     return pms
 
 def dedupe_placemarks(placemarks):
+    if len(placemarks) >= 50:
+        # vectorized key (rounded lat/lon + upper-cased name); first occurrence wins.
+        # Python round, not Series.round: numpy rounds some 7-decimal values the
+        # other way, and both paths must build the same key.
+        df = pd.DataFrame.from_records(placemarks, columns=["lat", "lon", "name"])
+        key = pd.DataFrame({
+            "lat": df["lat"].fillna(0).astype(float).map(lambda v: round(v, 6)),
+            "lon": df["lon"].fillna(0).astype(float).map(lambda v: round(v, 6)),
+            "name": df["name"].fillna("").astype(str).str.upper(),
+        })
+        keep = ~key.duplicated(keep="first").to_numpy()
+        return [pm for pm, k in zip(placemarks, keep) if k]
+
     seen=set(); out=[]
     for pm in placemarks:
         key=(round(pm.get("lat",0),6), round(pm.get("lon",0),6), pm.get("name","").upper())
@@ -436,7 +482,9 @@ def dedupe_placemarks(placemarks):
 
 import re
 from datetime import datetime, date
+from functools import lru_cache
 
+@lru_cache(maxsize=4096)
 def _to_ddmmyyyy(s: str) -> str:
     s = (s or "").strip()
     for fmt in ("%d/%m/%Y", "%Y-%m-%d", "%d-%m-%Y",
@@ -463,9 +511,9 @@ def extract_meta_from_label_value_df(df):
     """
     meta = {}
     try:
-        for _, r in df.iloc[:60, :2].iterrows():
-            k = str(r.iloc[0]).strip().rstrip(":").lower()
-            v = str(r.iloc[1]).strip()
+        for k, v in df.iloc[:60, :2].to_numpy(dtype=object):
+            k = str(k).strip().rstrip(":").lower()
+            v = str(v).strip()
             if k:
                 meta[k] = v
     except Exception:
@@ -25,6 +25,8 @@ kml_footer = make_kml_footer()
 """
 
 from __future__ import annotations
+import sys
+from functools import lru_cache
 from xml.sax.saxutils import escape
 
 # --- Color + icon presets ---
@@ -45,6 +47,18 @@ ICON_BY_KEY = {
 DEFAULT_ICON = "http://maps.google.com/mapfiles/kml/shapes/placemark_circle.png"
 
 
+# (key, fallback) pulled into the header metadata, in doc-name order
+_META_FALLBACKS = (
+    ("order_number", "WO"),
+    ("circuit_id", ""),
+    ("client_name", ""),
+    ("a_end", ""),
+    ("z_end", ""),
+    ("service_type", ""),
+    ("route_type", "Primary"),
+)
+
+
 def _get_meta(payload: dict, defaults: dict) -> dict:
     """Pulls useful bits from payload JSON, falling back to defaults/empty.
     You can extend the keys below if your JSON carries them under other paths.
@@ -54,19 +68,10 @@ def _get_meta(payload: dict, defaults: dict) -> dict:
     # like: {"metadata": {...}}
     md = (payload or {}).get("metadata", {}) if isinstance(payload, dict) else {}
 
-    def pick(*keys, default=None):
-        for k in keys:
-            if k in md and md[k]:
-                return md[k]
-        return default
-
-    meta.setdefault("order_number", pick("order_number", "WO"))
-    meta.setdefault("circuit_id", pick("circuit_id", ""))
-    meta.setdefault("client_name", pick("client_name", ""))
-    meta.setdefault("a_end", pick("a_end", ""))
-    meta.setdefault("z_end", pick("z_end", ""))
-    meta.setdefault("service_type", pick("service_type", ""))
-    meta.setdefault("route_type", pick("route_type", "Primary"))
+    # one pass: defaults win, then a truthy metadata value, then the fallback
+    for k, fallback in _META_FALLBACKS:
+        if k not in meta:
+            meta[k] = md.get(k) or fallback
 
     # Compose a readable <Document><name>
     parts = [
@@ -107,18 +112,20 @@ def _style_block(style_id: str, icon_href: str | None, label_color: str, line_co
   </Style>"""
 
 
+@lru_cache(maxsize=None)
 def _all_styles(route_type: str) -> str:
-    """Returns all <Style> blocks needed for the map, colored by route_type."""
+    """Returns all <Style> blocks needed for the map, colored by route_type.
+    The text only depends on route_type, so each one is built once and cached.
+    """
     label = ROUTE_LABEL_COLORS.get(route_type, WHITE)
 
     # Point styles by facility/plant (UG/AR) + a gray variant for No WO Activity
-    blocks = []
-    for fac in ["BFMH", "THESMH", "Pole", "Other"]:
-        for plant in ["UG", "AR"]:
-            icon = ICON_BY_KEY.get((fac, plant), DEFAULT_ICON)
-            sid = f"pt_{fac}_{plant}"
-            blocks.append(_style_block(sid, icon, label))
-            blocks.append(_style_block(sid + "_muted", icon, GRAY))  # No WO Activity
+    blocks = [
+        _style_block(f"pt_{fac}_{plant}{suffix}", ICON_BY_KEY.get((fac, plant), DEFAULT_ICON), color)
+        for fac in ("BFMH", "THESMH", "Pole", "Other")
+        for plant in ("UG", "AR")
+        for suffix, color in (("", label), ("_muted", GRAY))  # _muted: No WO Activity
+    ]
 
     # Default fallback
     blocks.append(_style_block("pt_default", DEFAULT_ICON, label))
@@ -136,13 +143,14 @@ def make_kml_header(payload_json: dict | None, defaults: dict | None = None) ->
     meta = _get_meta(payload_json or {}, defaults or {})
     name = escape(meta.get("doc_name", "WO"))
     route_type = meta.get("route_type", "Primary")
-    styles = _all_styles(route_type)
+    return _HEADER_TEMPLATE % (name, _all_styles(route_type))
+
 
-    return f"""<?xml version=\"1.0\" encoding=\"UTF-8\"?>
+_HEADER_TEMPLATE = """<?xml version=\"1.0\" encoding=\"UTF-8\"?>
 <kml xmlns=\"http://www.opengis.net/kml/2.2\"> 
 <Document>
-  <name>{name}</name>
-{styles}
+  <name>%s</name>
+%s
 """
 
 
@@ -158,9 +166,21 @@ def pick_style_id(*, facility: str | None, ar: bool | None, is_no_wo: bool, rout
     route_type is unused in the id (color comes from header styles), but kept for clarity.
     """
     fac = (facility or "Other").strip().upper()
-    if fac not in {"BFMH", "THESMH", "POLE"}:
-        fac = "Other"
-    plant = "AR" if ar else "UG"
-    base = f"pt_{fac}_{plant}" if fac != "Other" else "pt_default"
-    return base + ("_muted" if is_no_wo else "")
+    key = (fac, bool(ar), bool(is_no_wo))
+    sid = _STYLE_ID_TABLE.get(key)
+    if sid is None:
+        sid = _STYLE_ID_TABLE[("OTHER",) + key[1:]]
+    return sid
+
+
+# (FACILITY, aerial, no-WO) -> style id, built once since this runs per Placemark
+_STYLE_ID_TABLE = {
+    (fac, ar, muted): sys.intern(
+        (f"pt_{fac}_{'AR' if ar else 'UG'}" if fac != "OTHER" else "pt_default")
+        + ("_muted" if muted else "")
+    )
+    for fac in ("BFMH", "THESMH", "POLE", "OTHER")
+    for ar in (True, False)
+    for muted in (True, False)
+}
 
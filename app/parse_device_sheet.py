@@ -8,22 +8,48 @@ Reads a JSON with structure like:
 Parses the "Connections" text and produces a table:
 Device Name | Device Type | Type | Lat / Long | UG | AR | Activity | Dev Order
 """
-import re, json, argparse, pandas as pd
+import io, re, json, argparse, pandas as pd
+from functools import lru_cache
 
 HEADER_RE = re.compile(r'^[^,]+,\s*([^,]+),\s*Address:.*?:\s*(-?\d{1,2}\.\d+),\s*(-?\d{1,3}\.\d+)\s*:\s*:\s*(.+)$')
-DEV_FULL_RE = re.compile(r'^\s*(.+?)\s*:\s*OSP Splice Box\s*-\s*([A-Za-z0-9]+)\s*:\s*(.+)$')
-DEV1_RE     = re.compile(r'^\s*(.+?)\s*:\s*OSP Splice Box\s*-\s*([A-Za-z0-9]+)\s*:')
-GEN_FULL_RE = re.compile(r'^\s*(.+?)\s*:\s*Generic OSP Splice Box(?:\s*-\s*([A-Za-z0-9]+))?\s*:\s*(.+)$')
-GEN_RE      = re.compile(r'^\s*(.+?)\s*:\s*Generic OSP Splice Box(?:\s*-\s*([A-Za-z0-9]+))?\s*:')
-SS_FULL_RE  = re.compile(r'^\s*(.+?)\s*:\s*SS\b.*?:\s*(.+)$')
-SS_RE       = re.compile(r'^\s*(.+?)\s*:\s*SS\b.*:')
+# All device line shapes in one pattern. Top-level alternatives are tried in
+# order (full OSP, OSP, full Generic, Generic, full SS, SS), each with its own
+# backtracking, so the first alternative that fits wins just as if the shapes
+# were matched one after another. The outer named group tells which one hit.
+DEVICE_RE = re.compile(
+    r'^(?:'
+    r'(?P<dev_full>\s*(?P<n1>.+?)\s*:\s*OSP Splice Box\s*-\s*(?P<t1>[A-Za-z0-9]+)\s*:\s*(?P<d1>.+)$)'
+    r'|(?P<dev>\s*(?P<n2>.+?)\s*:\s*OSP Splice Box\s*-\s*(?P<t2>[A-Za-z0-9]+)\s*:)'
+    r'|(?P<gen_full>\s*(?P<n3>.+?)\s*:\s*Generic OSP Splice Box(?:\s*-\s*(?P<t3>[A-Za-z0-9]+))?\s*:\s*(?P<d3>.+)$)'
+    r'|(?P<gen>\s*(?P<n4>.+?)\s*:\s*Generic OSP Splice Box(?:\s*-\s*(?P<t4>[A-Za-z0-9]+))?\s*:)'
+    r'|(?P<ss_full>\s*(?P<n5>.+?)\s*:\s*SS\b.*?:\s*(?P<d5>.+)$)'
+    r'|(?P<ss>\s*(?P<n6>.+?)\s*:\s*SS\b.*:)'
+    r')'
+)
+
+# alternative -> (name_group, detail_group, devtype_group, dtype_default, box_kind)
+DEVICE_KINDS = {
+    'dev_full': ('n1', 'd1', 't1', None, 'FOSC'),
+    'dev':      ('n2', None, 't2', None, 'FOSC'),
+    'gen_full': ('n3', 'd3', 't3', 'Unknown', 'FOSC'),
+    'gen':      ('n4', None, 't4', 'Unknown', 'FOSC'),
+    'ss_full':  ('n5', 'd5', None, 'SS', 'SS/Coil'),
+    'ss':       ('n6', None, None, 'SS', 'SS/Coil'),
+}
+
+# QSP placeholder tokens, rewritten in a single pass
+CLEAN_RE  = re.compile(r'<(?:COMMA|COLON|OPEN|CLOSE|AND)>')
+CLEAN_MAP = {'<COMMA>':',', '<COLON>':':', '<OPEN>':'(', '<CLOSE>':')', '<AND>':'&'}
+
+def _clean_sub(m):
+    return CLEAN_MAP[m.group(0)]
 
 def clean_text(t: str) -> str:
-    t=(t or '')
-    t=t.replace('<COMMA>',',').replace('<COLON>',':').replace('<OPEN>','(').replace('<CLOSE>',')').replace('<AND>','&')
-    t=re.sub(r'\s+', ' ', t)
-    return t.strip()
+    # split()/join collapses whitespace runs and trims in C, no regex needed
+    return ' '.join(CLEAN_RE.sub(_clean_sub, t or '').split())
 
+# only a handful of distinct site types per sheet; cache per string
+@lru_cache(maxsize=64)
 def classify_site(site_type: str):
     s=(site_type or '').lower()
     if 'beanfield manhole/handwell' in s: return 'BFMH',100,0
@@ -31,59 +57,64 @@ def classify_site(site_type: str):
     if 'utility pole' in s or 'pole' in s: return 'Pole',0,100
     return 'Unknown',0,0
 
-def gather_connections(obj):
-    out=[]
-    def rec(x):
-        if isinstance(x, dict):
-            for k,v in x.items():
-                if k=='Connections' and isinstance(v,str):
-                    out.append(v)
-                else:
-                    rec(v)
+def iter_connections(obj):
+    """Yield every 'Connections' string, depth-first in document order (explicit stack, no recursion)."""
+    # a bare top-level string is not a Connections value
+    stack=[obj] if isinstance(obj,(dict,list)) else []
+    while stack:
+        x=stack.pop()
+        if isinstance(x, str):
+            yield x
+        elif isinstance(x, dict):
+            # only containers and Connections strings go on the stack
+            stack.extend(v for k,v in reversed(list(x.items()))
+                         if isinstance(v,(dict,list)) or (k=='Connections' and isinstance(v,str)))
         elif isinstance(x, list):
-            for it in x:
-                rec(it)
-    rec(obj)
-    return out
+            stack.extend(it for it in reversed(x) if isinstance(it,(dict,list)))
+
+def gather_connections(obj):
+    return list(iter_connections(obj))
 
 def parse_device_table(connections_text: str, append_details=False) -> pd.DataFrame:
     lat=lon=None; site_type=None
-    rows=[]
-    for raw in connections_text.splitlines():
+    # one list per output column, handed to pandas as-is (no row transpose)
+    names=[]; devtypes=[]; typs=[]; latlons=[]; ugs=[]; ars=[]
+    # bind hot-loop callables once
+    header_match=HEADER_RE.match; device_match=DEVICE_RE.match
+    kinds=DEVICE_KINDS; clean=clean_text; classify=classify_site
+    # iterate lines lazily instead of materializing splitlines(); newline=None
+    # keeps the \r / \r\n handling of splitlines
+    for raw in io.StringIO(connections_text, newline=None):
         line=raw.strip()
         if not line or line.startswith('CA') or line.startswith('PMID') or line.startswith('.') or line.startswith('Presented by'):
             continue
-        # Header?
-        m=HEADER_RE.match(line)
+        # Header? (HEADER_RE needs a literal "Address:", so test that first)
+        m=header_match(line) if 'Address:' in line else None
         if m:
             lat=float(m.group(2)); lon=float(m.group(3)); site_type=m.group(4)
             continue
-        # Device Patterns
-        matched=False
-        for (regex, detail_group, devtype_group, dtype_default, box_kind) in [
-            (DEV_FULL_RE, 3, 2, None, 'FOSC'),
-            (DEV1_RE,     None, 2, None, 'FOSC'),
-            (GEN_FULL_RE, 3, 2, 'Unknown', 'FOSC'),
-            (GEN_RE,      None, 2, 'Unknown', 'FOSC'),
-            (SS_FULL_RE,  2, None, 'SS', 'SS/Coil'),
-            (SS_RE,       None, None, 'SS', 'SS/Coil'),
-        ]:
-            m=regex.match(line)
-            if not m:
-                continue
-            name=clean_text(m.group(1))
-            devtype=clean_text(m.group(devtype_group)) if (devtype_group and m.group(devtype_group)) else dtype_default or 'Unknown'
-            if append_details and detail_group and m.group(detail_group):
-                details=clean_text(m.group(detail_group))
-                name=f"{name}: {details}"
-            typ,UG,AR = classify_site(site_type)
-            rows.append([name, devtype, typ, f"{lat},{lon}", UG, AR, "", None])
-            matched=True
-            break
-        # If no regex matched, ignore the line
-    for i,row in enumerate(rows, start=1):
-        row[-1]=i
-    return pd.DataFrame(rows, columns=['Device Name','Device Type','Type','Lat / Long','UG','AR','Activity','Dev Order'])
+        # Every device pattern needs one of these; skip the regexes otherwise
+        if 'OSP Splice Box' not in line and 'SS' not in line:
+            continue
+        # Device Patterns (one regex call per line)
+        m=device_match(line)
+        if not m:
+            continue  # If no pattern matched, ignore the line
+        name_group, detail_group, devtype_group, dtype_default, box_kind = kinds[m.lastgroup]
+        name=clean(m.group(name_group))
+        devtype=clean(m.group(devtype_group)) if (devtype_group and m.group(devtype_group)) else dtype_default or 'Unknown'
+        if append_details and detail_group and m.group(detail_group):
+            details=clean(m.group(detail_group))
+            name=f"{name}: {details}"
+        typ,UG,AR = classify(site_type)
+        names.append(name); devtypes.append(devtype); typs.append(typ)
+        latlons.append(f"{lat},{lon}"); ugs.append(UG); ars.append(AR)
+    n=len(names)
+    cols={'Device Name':names, 'Device Type':devtypes, 'Type':typs, 'Lat / Long':latlons,
+          'UG':ugs, 'AR':ars, 'Activity':[""]*n, 'Dev Order':list(range(1, n+1))}
+    if not n:
+        return pd.DataFrame(columns=list(cols))
+    return pd.DataFrame(cols)
 
 def main():
     ap=argparse.ArgumentParser()
@@ -94,11 +125,10 @@ def main():
     with open(args.json, 'r', encoding='utf-8') as f:
         data=json.load(f)
     # There may be multiple "Connections"; join them (often duplicates)
-    conns=gather_connections(data)
-    if not conns:
+    # Use the first unique string (stop walking once it is found)
+    conn_text=next(iter_connections(data), None)
+    if conn_text is None:
         raise SystemExit("No 'Connections' strings found under 'Report: Splice Details'.")
-    # Use the first unique string
-    conn_text=conns[0]
     df=parse_device_table(conn_text, append_details=args.append_details)
     df.to_csv(args.out, index=False, encoding='utf-8-sig')
     print(f"Wrote {len(df)} rows to {args.out}")
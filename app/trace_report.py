@@ -38,6 +38,7 @@ import json
 import re
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import io, os, json
 
@@ -60,7 +61,7 @@ def _kv_from_wo(df: pd.DataFrame) -> dict:
     Pandas will have the first line as header; we normalize.
     """
     # Normalize columns
-    df = df.copy()
+    df = df.copy(deep=False)  # only the labels change; don't touch the caller's frame
     df.columns = [str(c).strip() for c in df.columns]
     # All key:value rows live in the first two columns
     c0, c1 = df.columns[:2]
@@ -69,9 +70,11 @@ def _kv_from_wo(df: pd.DataFrame) -> dict:
     end = int(up_to[0]) if len(up_to) else len(df)
 
     kv = {}
-    for _, row in df.iloc[:end].iterrows():
-        k = str(row[c0]).strip()
-        v = str(row[c1]).strip()
+    keys = df[c0].iloc[:end].to_numpy(dtype=object)
+    vals = df[c1].iloc[:end].to_numpy(dtype=object)
+    for k, v in zip(keys, vals):
+        k = str(k).strip()
+        v = str(v).strip()
         if k and k.lower() != "nan":
             if v.lower() in ("nan", ""):
                 continue
@@ -80,7 +83,7 @@ def _kv_from_wo(df: pd.DataFrame) -> dict:
 
 def _actions_from_wo(df: pd.DataFrame) -> pd.DataFrame:
     # Find the "Action" header row
-    df = df.copy()
+    df = df.copy(deep=False)  # only the labels change; don't touch the caller's frame
     df.columns = [str(c).strip() for c in df.columns]
     c0 = df.columns[0]
     start_idx = df.index[df[c0].astype(str).str.strip().str.lower() == "action"]
@@ -92,24 +95,21 @@ def _actions_from_wo(df: pd.DataFrame) -> pd.DataFrame:
     sub = df.iloc[start:].reset_index(drop=True)
     cols = list(sub.columns) + ["", ""]
     # Map first 3 columns to Action/Description/SAP
-    out = sub.iloc[:, :3].copy()
+    out = sub.iloc[:, :3]
     out.columns = ["Action", "Description", "SAP"]
     # Drop completely empty rows
     out = out.dropna(how="all")
     return out
 
-def _count_breaks(actions_df: pd.DataFrame) -> int:
-    if actions_df.empty:
-        return 0
-    txt = actions_df["Description"].astype(str).str.upper()
-    # robust: count rows that *contain* 'BREAK'
-    return int((txt.str.contains(r"\bBREAK\b", regex=True)).sum())
+_BREAK_RE = re.compile(r"\bBREAK\b", re.I)
+_SPLICE_RE = re.compile(r"\bSPLICE\b", re.I)
 
-def _count_splices(actions_df: pd.DataFrame) -> int:
+def _count_actions(actions_df: pd.DataFrame) -> tuple:
+    """(breaks, splices): rows whose Description *contains* BREAK / SPLICE."""
     if actions_df.empty:
-        return 0
-    txt = actions_df["Description"].astype(str).str.upper()
-    return int((txt.str.contains(r"\bSPLICE\b", regex=True)).sum())
+        return 0, 0
+    txt = actions_df["Description"].astype(str)
+    return int(txt.str.contains(_BREAK_RE).sum()), int(txt.str.contains(_SPLICE_RE).sum())
 
 def _normalize_json_block_text(block: str) -> str:
     """
@@ -122,17 +122,21 @@ def _normalize_json_block_text(block: str) -> str:
     s = s.replace("\\n", "\n")
     return s
 
+_LATLON_LABEL_RE = re.compile(r"lat[:=]\s*([\-+]?\d+(?:\.\d+)?)\D+lon[:=]\s*([\-+]?\d+(?:\.\d+)?)", re.I)
+_LATLON_PAIR_RE = re.compile(r"([\-+]?\d+(?:\.\d+)?)\s*,\s*([\-+]?\d+(?:\.\d+)?)")
+
 def _extract_latlon(s: str):
     """
     Try a few patterns to find latitude/longitude in a line.
     Returns (lat, lon) as strings or (None, None).
     """
+    # cheap substring tests first: each regex needs its literal to be present
     # e.g., "Lat: 43.64, Lon: -79.38"
-    m = re.search(r"lat[:=]\s*([\-+]?\d+(?:\.\d+)?)\D+lon[:=]\s*([\-+]?\d+(?:\.\d+)?)", s, re.I)
+    m = _LATLON_LABEL_RE.search(s) if "lat" in s.lower() else None
     if m:
         return m.group(1), m.group(2)
     # e.g., "... 43.64, -79.38 ..."
-    m = re.search(r"([\-+]?\d+(?:\.\d+)?)\s*,\s*([\-+]?\d+(?:\.\d+)?)", s)
+    m = _LATLON_PAIR_RE.search(s) if "," in s else None
     if m:
         # crude sanity: lat in [-90,90], lon in [-180,180]
         lat, lon = float(m.group(1)), float(m.group(2))
@@ -141,6 +145,14 @@ def _extract_latlon(s: str):
     return None, None
     
 
+def _json_from_bytes(raw) -> dict:
+    # json.loads takes bytes directly (no decoded str copy of a large payload);
+    # only invalid UTF-8 falls back to the old lenient decode
+    try:
+        return json.loads(raw)
+    except UnicodeDecodeError:
+        return json.loads(bytes(raw).decode("utf-8", errors="ignore"))
+
 def _details_from_json(json_src) -> pd.DataFrame:
     """
     Accepts a filesystem path, a Streamlit UploadedFile, bytes, or any file-like object.
@@ -152,23 +164,32 @@ def _details_from_json(json_src) -> pd.DataFrame:
 
     # Streamlit UploadedFile (preferred)
     elif hasattr(json_src, "getvalue"):
-        raw = json_src.getvalue()                       # bytes
-        j = json.loads(raw.decode("utf-8", errors="ignore"))
+        j = _json_from_bytes(json_src.getvalue())
 
     # Generic file-like object
     elif hasattr(json_src, "read"):
         raw = json_src.read()
-        if isinstance(raw, (bytes, bytearray)):
-            raw = raw.decode("utf-8", errors="ignore")
-        j = json.loads(raw)
+        j = _json_from_bytes(raw) if isinstance(raw, (bytes, bytearray)) else json.loads(raw)
 
     # Raw bytes
     elif isinstance(json_src, (bytes, bytearray)):
-        j = json.loads(bytes(json_src).decode("utf-8", errors="ignore"))
+        j = _json_from_bytes(json_src)
 
     else:
         raise TypeError(f"Unsupported json_src type: {type(json_src)}")
 
+    return build_details_df_from_payload(j)
+
+# Keys on the usual path to the splice-details text
+_DETAILS_KEYS = ("Report: Splice Details", "")
+
+# Segment separator and per-segment header line of the splice-details text
+_SEG_SPLIT_RE = re.compile(r"\n\.\n\.\n")
+_HEADER_RE = re.compile(
+    r"^\s*(?P<city>[^,]+)\s*,\s*(?P<site>[^,]+)\s*,\s*Address:(?P<address>[^,]*)\(\)\s*:\s*"
+    r"(?P<lat>-?\d+(?:\.\d+)?)\s*,\s*(?P<lon>-?\d+(?:\.\d+)?)\s*:\s*:\s*(?P<box>.+?)\s*$"
+)
+
 #  Parse JSON into a details table
 def build_details_df_from_payload(payload: dict) -> pd.DataFrame:
     """
@@ -178,46 +199,41 @@ def build_details_df_from_payload(payload: dict) -> pd.DataFrame:
     text_blob = None
     try:
         text_blob = payload["Report: Splice Details"][0][""][0]
+        if isinstance(text_blob, dict):  # current exports wrap it as {"Connections": "..."}
+            text_blob = text_blob.get("Connections")
     except Exception:
+        pass
+    if not isinstance(text_blob, str):
+        text_blob = None
         # fallback: find the first very long string in the payload
-        def find_first_long_string(obj):
-            if isinstance(obj, str) and len(obj) > 1000: return obj
-            if isinstance(obj, dict):
-                for v in obj.values():
-                    r = find_first_long_string(v)
-                    if r: return r
-            if isinstance(obj, list):
-                for v in obj:
-                    r = find_first_long_string(v)
-                    if r: return r
-            return None
-        text_blob = find_first_long_string(payload)
+        # (explicit-stack DFS; the usual "Report: Splice Details"/"" path is searched first)
+        stack = [payload]
+        while stack:
+            x = stack.pop()
+            if isinstance(x, str):
+                if len(x) > 1000:
+                    text_blob = x
+                    break
+            elif isinstance(x, dict):
+                stack.extend(v for k, v in reversed(list(x.items())) if k not in _DETAILS_KEYS)
+                stack.extend(x[k] for k in reversed(_DETAILS_KEYS) if k in x)
+            elif isinstance(x, list):
+                stack.extend(reversed(x))
 
     if not text_blob:
         return pd.DataFrame(columns=[
             "segment_index","city","site","address","latitude","longitude","box_descriptor","raw"
         ])
 
-    segments = re.split(r"\n\.\n\.\n", text_blob.strip())
-    header_re = re.compile(
-        r"""^\s*
-        (?P<city>[^,]+)\s*,\s*
-        (?P<site>[^,]+)\s*,\s*
-        Address:(?P<address>[^,]*)
-        \(\)\s*:\s*
-        (?P<lat>-?\d+(?:\.\d+)?)\s*,\s*(?P<lon>-?\d+(?:\.\d+)?)
-        \s*:\s*:\s*
-        (?P<box>.+?)\s*$""",
-        re.VERBOSE
-    )
+    segments = _SEG_SPLIT_RE.split(text_blob.strip())
 
-    rows = []
-    for idx, seg in enumerate(segments):
+    # one list per output column (no per-segment dicts for pandas to re-infer)
+    cities, sites, addrs, lats, lons, boxes, raws = [], [], [], [], [], [], []
+    for seg in segments:
         seg = seg.strip()
-        lines = [l for l in seg.splitlines() if l.strip()]
         city=site=address=lat=lon=box=None
-        for line in lines:
-            m = header_re.match(line)
+        for line in seg.splitlines():
+            m = _HEADER_RE.match(line) if line.strip() else None
             if m:
                 city = m.group("city")
                 site = m.group("site")
@@ -226,13 +242,16 @@ def build_details_df_from_payload(payload: dict) -> pd.DataFrame:
                 lon = float(m.group("lon"))
                 box = m.group("box")
                 break
-        rows.append(dict(
-            segment_index=idx,
-            city=city, site=site, address=address,
-            latitude=lat, longitude=lon,
-            box_descriptor=box, raw=seg
-        ))
-    return pd.DataFrame(rows)
+        cities.append(city); sites.append(site); addrs.append(address)
+        lats.append(lat); lons.append(lon); boxes.append(box); raws.append(seg)
+    return pd.DataFrame({
+        "segment_index": np.arange(len(raws)),
+        "city": cities, "site": sites, "address": addrs,
+        # missing coords become NaN in a float column
+        "latitude": np.array(lats, dtype=np.float64),
+        "longitude": np.array(lons, dtype=np.float64),
+        "box_descriptor": boxes, "raw": raws,
+    })
 
 def build_workbook(
     out_xlsx: Path,
@@ -245,15 +264,19 @@ def build_workbook(
 ):
     """
     Write Excel with two sheets using xlsxwriter formatting and a Google Maps hyperlink column.
+    The workbook runs in constant_memory mode: every sheet is written strictly
+    row by row, so finished rows are flushed instead of held until save.
     """
-    with pd.ExcelWriter(out_xlsx, engine="xlsxwriter") as xl:
+    with pd.ExcelWriter(out_xlsx, engine="xlsxwriter",
+                        engine_kwargs={"options": {"constant_memory": True}}) as xl:
         # -------- Sheet 1: Summary
         ws1_name = "Summary"
         # Header grid matching your screenshot
         # Left side (labels / values), Right side (counts & A/Z ends)
+        n_breaks, n_splices = _count_actions(actions_df)
         summary_rows = [
-            ("Order Number:", meta["order_id"], "Number of Fibre Breaks:", str(_count_breaks(actions_df))),
-            ("Work Order Number:", wo_kv.get("Work Order", ""), "Number of Fibre Splices", str(_count_splices(actions_df))),
+            ("Order Number:", meta["order_id"], "Number of Fibre Breaks:", str(n_breaks)),
+            ("Work Order Number:", wo_kv.get("Work Order", ""), "Number of Fibre Splices", str(n_splices)),
             ("Order A to Z:", f"{meta['a_end']}_{meta['z_end']}", "End to End Length(m)", end_to_end_m),
             ("Designer:", meta["designer_name"], "End to End ~ OTDR(m)", end_to_end_otdr_m),
             ("Contact Number:", meta["designer_phone"], "A END:", meta["a_end"]),
@@ -285,22 +308,20 @@ def build_workbook(
         r += 1
 
         # Action table header
-        ws1.write(r, 0, "Action", header_fmt)
-        ws1.write(r, 1, "Description", header_fmt)
-        ws1.write(r, 2, "SAP", header_fmt)
+        ws1.write_row(r, 0, ("Action", "Description", "SAP"), header_fmt)
         r += 1
 
         # Action rows
         if not actions_df.empty:
-            for _, row in actions_df.iterrows():
-                ws1.write(r, 0, str(row.get("Action", "")))
-                ws1.write(r, 1, str(row.get("Description", "")))
-                ws1.write(r, 2, str(row.get("SAP", "")))
+            cols = [actions_df[c].to_numpy(dtype=object) if c in actions_df.columns
+                    else [""] * len(actions_df) for c in ("Action", "Description", "SAP")]
+            for a, d, s in zip(*cols):
+                ws1.write_row(r, 0, (str(a), str(d), str(s)))
                 r += 1
 
         # Add a light border around the action table
-        ws1.conditional_format( (len(summary_rows)+2, 0, r-1, 2),
-                                {"type": "no_blanks", "format": border_fmt})
+        ws1.conditional_format(len(summary_rows)+2, 0, r-1, 2,
+                               {"type": "no_blanks", "format": border_fmt})
 
         # -------- Sheet 2: Details
         ws2_name = "Details"
@@ -309,18 +330,29 @@ def build_workbook(
             "Length", "~OTDR Length", "Meter Marks", "Eq Location", "EQ Type", "Activity",
             "Tray", "Slot", "Map It"
         ]
-        det = details_df.reindex(columns=details_cols, fill_value="")
+        # one object array per output column ("" for missing ones, NaN -> blank)
+        n = len(details_df)
+        det_data = [
+            details_df[c].astype(object).where(details_df[c].notna(), None).to_numpy()
+            if c in details_df.columns else [""] * n
+            for c in details_cols
+        ]
 
-        det.to_excel(xl, sheet_name=ws2_name, index=False)
-        ws2 = xl.sheets[ws2_name]
+        # to_excel writes column by column, which constant_memory can't take;
+        # write the header + rows ourselves
+        ws2 = book.add_worksheet(ws2_name)
         ws2.set_column("A:A", 12)
         ws2.set_column("B:B", 120)
         ws2.set_column("M:M", 20)
+        ws2.write_row(0, 0, details_cols)
 
-        # Turn "Map It" strings into actual hyperlinks
-        for i, url in enumerate(det["Map It"].tolist(), start=1):  # +1 for header row
+        link_col = details_cols.index("Map It")
+        for i, row in enumerate(zip(*det_data), start=1):  # +1 for header row
+            ws2.write_row(i, 0, row)
+            # Turn "Map It" strings into actual hyperlinks
+            url = row[link_col]
             if isinstance(url, str) and url.startswith("http"):
-                ws2.write_url(i, details_cols.index("Map It"), url, string="Google Maps")
+                ws2.write_url(i, link_col, url, string="Google Maps")
 
 
 def main():
@@ -32,18 +32,21 @@ Requirements (put these in requirements.txt):
     PySide6-Essentials>=6.6
     folium
     jinja2
-    fastkml  # optional; if missing, preview falls back or is skipped
-    shapely  # optional; fastkml may use it
+    lxml     # optional; if missing, preview shows the base map only
 
 """
 from __future__ import annotations
 import os
 import sys
 import json
+import time
 import traceback
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 
+import numpy as np
+
 from PySide6 import QtCore, QtGui, QtWidgets
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QFileDialog, QMessageBox,
@@ -58,28 +61,35 @@ try:
 except Exception:
     QWebEngineView = None  # Preview will be disabled if QtWebEngine isn't available
 
-# Optional import of your existing pipeline modules (best-effort)
-# These may or may not exist; failures are handled later.
+# Folium for the map preview (imported once here instead of on every preview)
 try:
-    import app as app_module  # your original orchestrator
+    import folium
+    from folium.plugins import BeautifyIcon  # noqa: F401  (not required but keeps plugin import tested)
+    _HAS_FOLIUM = True
 except Exception:
-    app_module = None
+    folium = None
+    _HAS_FOLIUM = False
+
+# Optional import of your existing pipeline modules (best-effort)
+# Imported on first run instead of at startup; failures are handled there.
+_app_module = None
 
-# Other helpers (import if present; it's fine if they are missing)
-for modname in [
-    "_to_kml", "kml_helper", "parse_device_sheet", "trace_report",
-    "fibre_trace", "remove_add_algo"
-]:
-    try:
-        __import__(modname)
-    except Exception:
-        pass
+
+def _get_app():
+    """Returns your original orchestrator module (app.py), or None if it can't be imported."""
+    global _app_module
+    if _app_module is None:
+        try:
+            import app as _app_module
+        except Exception:
+            _app_module = False
+    return _app_module or None
 
 # ------------------------
 # Pipeline adapter
 # ------------------------
 
-def run_pipeline_core(manual: dict, json_path: Path, csv_path: Path, out_dir: Path) -> dict:
+def run_pipeline_core(manual: dict, json_path: Path, csv_path: Path, out_dir: Path, log_cb=None) -> dict:
     """Calls your existing processing code to produce outputs.
 
     This function tries a few likely call patterns:
@@ -96,14 +106,21 @@ def run_pipeline_core(manual: dict, json_path: Path, csv_path: Path, out_dir: Pa
         "csvs": [Path, ...],
         "log": str
       }
+    When log_cb is given, each log line is passed to it as it is produced
+    and "log" comes back empty.
     """
     log_lines = []
     produced_kml: Path | None = None
     produced_csvs: list[Path] = []
 
+    emit = log_cb if log_cb is not None else log_lines.append
+    last = [-1, ""]  # second of the cached prefix, "[HH:MM:SS] " for it
+
     def log(msg: str):
-        ts = datetime.now().strftime("%H:%M:%S")
-        log_lines.append(f"[{ts}] {msg}")
+        sec = int(time.time())
+        if sec != last[0]:
+            last[0], last[1] = sec, time.strftime("[%H:%M:%S] ", time.localtime(sec))
+        emit(last[1] + msg)
 
     json_path = Path(json_path)
     csv_path = Path(csv_path)
@@ -111,6 +128,7 @@ def run_pipeline_core(manual: dict, json_path: Path, csv_path: Path, out_dir: Pa
     out_dir.mkdir(parents=True, exist_ok=True)
 
     # Try well-known orchestrators in your app.py
+    app_module = _get_app()
     if app_module is not None:
         for fname, kwargs in [
             ("main", dict(json_path=json_path, csv_path=csv_path, out_dir=out_dir, **manual)),
@@ -163,8 +181,10 @@ def run_pipeline_core(manual: dict, json_path: Path, csv_path: Path, out_dir: Pa
         produced_kml = out_dir / (json_path.stem + ".kml")
         shutil.copyfile(json_path, out_dir / json_path.name)
         shutil.copyfile(csv_path, out_dir / csv_path.name)
-        with open(produced_kml, "w", encoding="utf-8") as f:
-            f.write("<?xml version='1.0' encoding='UTF-8'?>\n<kml xmlns='http://www.opengis.net/kml/2.2'>\n<Document>\n<Name>Placeholder</Name>\n</Document>\n</kml>\n")
+        # write next to the target and swap in, so the preview never sees a half-written KML
+        tmp = produced_kml.with_suffix(".kml.tmp")
+        tmp.write_bytes(b"<?xml version='1.0' encoding='UTF-8'?>\n<kml xmlns='http://www.opengis.net/kml/2.2'>\n<Document>\n<Name>Placeholder</Name>\n</Document>\n</kml>\n")
+        os.replace(tmp, produced_kml)
         produced_csvs = [out_dir / csv_path.name]
         log("Fallback pipeline wrote placeholder outputs. Replace with real functions.")
     except Exception:
@@ -174,19 +194,105 @@ def run_pipeline_core(manual: dict, json_path: Path, csv_path: Path, out_dir: Pa
     return {"kml": produced_kml, "csvs": produced_csvs, "log": "\n".join(log_lines)}
 
 
+class _PipelineSignals(QtCore.QObject):
+    done = QtCore.Signal(object)   # result dict from run_pipeline_core
+    error = QtCore.Signal(str)     # formatted traceback
+    log = QtCore.Signal(str)       # one log line, emitted while the pipeline runs
+
+
+class PipelineWorker(QtCore.QRunnable):
+    """Runs run_pipeline_core on a QThreadPool thread so the UI keeps painting.
+    Results come back to the GUI thread through queued signals.
+    """
+    def __init__(self, manual: dict, json_path: Path, csv_path: Path, out_dir: Path):
+        super().__init__()
+        self.args = (manual, json_path, csv_path, out_dir)
+        self.signals = _PipelineSignals()
+
+    def run(self):
+        try:
+            res = run_pipeline_core(*self.args, log_cb=self.signals.log.emit)
+        except Exception:
+            self.signals.error.emit(traceback.format_exc())
+        else:
+            self.signals.done.emit(res)
+
+
 # ------------------------
 # Map preview helpers
 # ------------------------
 
+_KML_NS = "{http://www.opengis.net/kml/2.2}"
+
+
+def _parse_coords(txt: str | None) -> list:
+    """'lon,lat[,alt] lon,lat[,alt] ...' -> [[lon, lat], ...]"""
+    out = []
+    for t in (txt or "").split():
+        parts = t.split(",")
+        if len(parts) >= 2:
+            out.append([float(parts[0]), float(parts[1])])
+    return out
+
+
+def _kml_stream_to_geojson(kml_path: Path):
+    """Streams Point/LineString/Polygon elements out of the KML with lxml iterparse
+    (no full document tree, no shapely objects).
+    Returns (features, bounds); bounds is [min_lon, min_lat, max_lon, max_lat] or None.
+    """
+    from lxml import etree
+    ns = _KML_NS
+    feats = []
+    all_pts = []  # every [lon, lat] seen, reduced once for the bounds
+    context = etree.iterparse(
+        str(kml_path), events=("end",),
+        tag=(ns + "Point", ns + "LineString", ns + "Polygon", ns + "Placemark"), huge_tree=True
+    )
+    for _, elem in context:
+        kind = etree.QName(elem).localname
+        if kind == "Placemark":
+            # placemark finished: drop it and everything parsed before it
+            # (names, styles, earlier placemarks) so the tree doesn't grow
+            elem.clear()
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+                parent.remove(elem)
+            continue
+        if kind == "Polygon":
+            # outer ring first (document order), then any inner rings
+            coords = [r for r in (_parse_coords(c.text) for c in elem.iter(ns + "coordinates")) if r]
+            pts = [p for ring in coords for p in ring]
+        else:
+            pts = _parse_coords(elem.findtext(ns + "coordinates"))
+            coords = pts[0] if (kind == "Point" and pts) else pts
+        # free the geometry (its Placemark is dropped at the Placemark end)
+        elem.clear()
+        if not pts:
+            continue
+        feats.append({"type": "Feature", "geometry": {"type": kind, "coordinates": coords}, "properties": {}})
+        all_pts.extend(pts)
+    if not all_pts:
+        return feats, None
+    arr = np.asarray(all_pts, dtype=float)
+    bounds = [*arr.min(axis=0).tolist(), *arr.max(axis=0).tolist()]
+    return feats, bounds
+
+
+def _warm_folium():
+    try:
+        folium.Map(location=[0, 0]).get_root().render()
+    except Exception:
+        pass
+
+
 def kml_to_map_html(kml_path: Path, html_out: Path) -> Path | None:
     """Renders a very simple Folium map and tries to overlay the KML.
-    If fastkml is not available or KML has complex geometries, we still
+    If lxml is not available or the KML can't be parsed, we still
     give the user a base map centered roughly on Toronto.
     """
-    try:
-        import folium
-        from folium.plugins import BeautifyIcon  # noqa: F401  (not required but keeps plugin import tested)
-    except Exception:
+    if not _HAS_FOLIUM:
         return None
 
     # Create a basic map; if we can parse the KML, we will fit to bounds
@@ -194,43 +300,13 @@ def kml_to_map_html(kml_path: Path, html_out: Path) -> Path | None:
 
     # Try to add KML overlay. Folium doesn't parse KML natively; we convert to GeoJSON if possible.
     try:
-        from fastkml import kml
-        from shapely.geometry import mapping
-        k = kml.KML()
-        with open(kml_path, 'rb') as f:
-            k.from_string(f.read())
-        geoms = []
-        def recurse(feat):
-            for ftr in getattr(feat, 'features', []):
-                if hasattr(ftr, 'geometry') and ftr.geometry is not None:
-                    geoms.append(ftr.geometry)
-                recurse(ftr)
-        recurse(k)
-        gj = {
-            "type": "FeatureCollection",
-            "features": [
-                {"type": "Feature", "geometry": mapping(g), "properties": {}} for g in geoms
-            ],
-        }
+        feats, bounds = _kml_stream_to_geojson(kml_path)
+        gj = {"type": "FeatureCollection", "features": feats}
         folium.GeoJson(gj, name="Trace").add_to(m)
-        try:
-            # fit to bounds if we have any
-            bounds = []
-            for g in geoms:
-                try:
-                    minx, miny, maxx, maxy = g.bounds
-                    bounds.append([[miny, minx], [maxy, maxx]])
-                except Exception:
-                    pass
-            if bounds:
-                # Compute overall bounds
-                min_lat = min(b[0][0] for b in bounds)
-                min_lon = min(b[0][1] for b in bounds)
-                max_lat = max(b[1][0] for b in bounds)
-                max_lon = max(b[1][1] for b in bounds)
-                m.fit_bounds([[min_lat, min_lon], [max_lat, max_lon]])
-        except Exception:
-            pass
+        if bounds:
+            # fit to the overall bounds collected while streaming
+            min_lon, min_lat, max_lon, max_lat = bounds
+            m.fit_bounds([[min_lat, min_lon], [max_lat, max_lon]])
     except Exception:
         # No overlay, just base map
         pass
@@ -250,6 +326,11 @@ class FiberTraceWindow(QMainWindow):
 
         self.out_dir: Path | None = None
         self.html_preview_path: Path | None = None
+        self._worker_signals: _PipelineSignals | None = None  # keep alive while a run is in flight
+        self._map_cache: dict = {}  # (kml path, mtime_ns, size) -> rendered preview html
+        if _HAS_FOLIUM and QWebEngineView is not None:
+            # render one throwaway map off the GUI thread so the first preview doesn't pay for Jinja setup
+            QtCore.QThreadPool.globalInstance().start(_warm_folium)
 
         root = QWidget()
         self.setCentralWidget(root)
@@ -317,10 +398,20 @@ class FiberTraceWindow(QMainWindow):
         right_box.addWidget(QLabel("Log"))
         right_box.addWidget(self.log, 2)
 
+        # Log lines are buffered and flushed together so bursts don't repaint per line
+        self._log_buf = deque()
+        self._log_timer = QtCore.QTimer(self)
+        self._log_timer.setSingleShot(True)
+        self._log_timer.setInterval(50)
+        self._log_timer.timeout.connect(self._flush_log)
+
         if QWebEngineView is not None:
-            self.web = QWebEngineView()
+            # The Chromium-backed view is only created for the first preview (see _ensure_web)
+            self.web = None
+            self._preview_placeholder = QLabel("No preview yet.")
+            self._preview_placeholder.setAlignment(Qt.AlignCenter)
             right_box.addWidget(QLabel("Preview"))
-            right_box.addWidget(self.web, 5)
+            right_box.addWidget(self._preview_placeholder, 5)
         else:
             self.web = None
             msg = QLabel("QtWebEngine not available — map preview disabled.")
@@ -334,7 +425,26 @@ class FiberTraceWindow(QMainWindow):
         root.setLayout(layout)
 
     # ---------- UI helpers ----------
+    def _ensure_web(self):
+        """Swaps the preview placeholder for a QWebEngineView the first time a map is shown."""
+        if self.web is None:
+            self.web = QWebEngineView()
+            ph = self._preview_placeholder
+            ph.parentWidget().layout().replaceWidget(ph, self.web)
+            ph.deleteLater()
+            self._preview_placeholder = None
+        return self.web
+
     def append_log(self, text: str):
+        self._log_buf.append(text)
+        if not self._log_timer.isActive():
+            self._log_timer.start()
+
+    def _flush_log(self):
+        if not self._log_buf:
+            return
+        text = "\n".join(self._log_buf)
+        self._log_buf.clear()
         self.log.appendPlainText(text)
         self.log.verticalScrollBar().setValue(self.log.verticalScrollBar().maximum())
 
@@ -398,8 +508,31 @@ class FiberTraceWindow(QMainWindow):
             }
 
             self.append_log("Starting pipeline…")
-            res = run_pipeline_core(manual, json_path, csv_path, self.out_dir)
-            self.append_log(res.get("log", "(no log)"))
+            worker = PipelineWorker(manual, json_path, csv_path, self.out_dir)
+            worker.signals.done.connect(self._on_pipeline_done)
+            worker.signals.error.connect(self._on_pipeline_error)
+            worker.signals.log.connect(self.append_log)
+            self._worker_signals = worker.signals
+            self.run_btn.setEnabled(False)
+            QtCore.QThreadPool.globalInstance().start(worker)
+        except Exception as e:
+            traceback.print_exc()
+            QMessageBox.critical(self, "Error", f"{e}\n\nSee log for details.")
+            self.append_log("ERROR:\n" + traceback.format_exc())
+
+    def _on_pipeline_error(self, tb: str):
+        self.run_btn.setEnabled(True)
+        self._worker_signals = None
+        print(tb, file=sys.stderr)
+        QMessageBox.critical(self, "Error", f"{tb.strip().splitlines()[-1]}\n\nSee log for details.")
+        self.append_log("ERROR:\n" + tb)
+
+    def _on_pipeline_done(self, res: dict):
+        self.run_btn.setEnabled(True)
+        self._worker_signals = None
+        try:
+            if res.get("log"):
+                self.append_log(res["log"])
 
             kml_path = res.get("kml")
             csvs = res.get("csvs") or []
@@ -411,13 +544,20 @@ class FiberTraceWindow(QMainWindow):
             # Preview
             if self.preview_check.isChecked() and kml_path and QWebEngineView is not None:
                 html_out = self.out_dir / "preview.html"
-                html = kml_to_map_html(kml_path, html_out)
+                st = Path(kml_path).stat()
+                key = (str(kml_path), st.st_mtime_ns, st.st_size)
+                html = self._map_cache.get(key)
+                if html is None or not html.exists():
+                    # KML changed (or first run): render through folium again
+                    html = kml_to_map_html(kml_path, html_out)
+                    if html:
+                        self._map_cache = {key: html}
                 if html:
                     self.html_preview_path = html
-                    self.web.setUrl(QUrl.fromLocalFile(str(html)))
+                    self._ensure_web().setUrl(QUrl.fromLocalFile(str(html)))
                     self.append_log("Preview updated.")
                 else:
-                    self.append_log("Preview skipped (folium/fastkml not available).")
+                    self.append_log("Preview skipped (folium not available).")
             elif not kml_path:
                 self.append_log("No KML produced — preview skipped.")
 
@@ -484,6 +624,6 @@ Distribute the dist/FiberTrace.exe (or the whole dist/FiberTrace folder when usi
 Troubleshooting
 ---------------
 - If app.py exposes a different entrypoint/signature, edit run_pipeline_core() accordingly.
-- If Folium or fastkml are not desired, uncheck preview in the UI or remove those deps.
+- If Folium or lxml are not desired, uncheck preview in the UI or remove those deps.
 - If the web preview crashes inside the exe, use --onefolder first to confirm QtWebEngine resources are included.
 """
@@ -1,30 +1,69 @@
-import os, sys, subprocess, socket, time, signal, shutil, tempfile
+import os, sys, atexit, subprocess, socket, time, signal, shutil, tempfile, threading
+from collections import deque
 from pathlib import Path
 
 # ---------------- CONFIG ----------------
 APP_REL_PATH = Path("app/app.py")
 STREAMLIT_PORT = 8501
-LOCK_PORT = 8765                 # single-instance lock port
+LOCK_PORT = 8765                 # single-instance lock port (POSIX)
+LOCK_MUTEX = "Local\\FiberTraceLauncher"  # single-instance named mutex (Windows)
 WINDOW_TITLE = "My Streamlit App"
 WINDOW_W, WINDOW_H = 1200, 800
 STARTUP_TIMEOUT_S = 40
+LOADING_HTML = "<body style='font-family:sans-serif;color:#666'><p>Starting…</p></body>"
 # ----------------------------------------
 
 def _resource_path(rel: Path) -> Path:
     base = Path(getattr(sys, "_MEIPASS", Path(__file__).parent))
     return (base / rel).resolve()
 
+def _link_tree(src: Path, dst: Path):
+    """Mirrors src into dst with hardlinks; copies a file only when linking fails (e.g. another volume)."""
+    for p in src.rglob("*"):
+        out = dst / p.relative_to(src)
+        if p.is_dir():
+            out.mkdir(parents=True, exist_ok=True)
+        else:
+            out.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(p, out)
+            except OSError:
+                shutil.copy2(p, out)
+
 def port_in_use(port: int) -> bool:
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.settimeout(0.2)
         return s.connect_ex(("127.0.0.1", port)) == 0
 
+def _acquire_windows_mutex(name: str):
+    """Named mutex; Windows drops it when the process dies, so a crash never leaves a stale lock."""
+    import ctypes
+    from ctypes import wintypes
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    # HANDLE is pointer-sized; the default int restype would truncate it on 64-bit
+    kernel32.CreateMutexW.argtypes = (wintypes.LPVOID, wintypes.BOOL, wintypes.LPCWSTR)
+    kernel32.CreateMutexW.restype = wintypes.HANDLE
+    kernel32.CloseHandle.argtypes = (wintypes.HANDLE,)
+    kernel32.CloseHandle.restype = wintypes.BOOL
+    handle = kernel32.CreateMutexW(None, True, name)
+    already_running = ctypes.get_last_error() == 183  # ERROR_ALREADY_EXISTS
+    if not handle or already_running:
+        if handle:
+            kernel32.CloseHandle(handle)
+        raise SystemExit("Another instance is already running.")
+    return handle  # keep it for the process lifetime
+
 def acquire_single_instance_lock(port: int):
-    """Prevents multiple launcher instances (returns the bound socket)."""
+    """Prevents multiple launcher instances (returns the mutex handle on Windows, else the bound socket)."""
+    if sys.platform == "win32":
+        return _acquire_windows_mutex(LOCK_MUTEX)
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    # relaunch right after a crash shouldn't trip over TIME_WAIT; a live listener still blocks the bind
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
     try:
         s.bind(("127.0.0.1", port))
         s.listen(1)
+        atexit.register(s.close)
         return s  # keep it open for the process lifetime
     except OSError:
         raise SystemExit("Another instance is already running.")
@@ -46,49 +85,67 @@ def launch_streamlit(app_path: Path, port: int) -> subprocess.Popen:
     ]
     return subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
 
-def wait_for_server(port: int, timeout=STARTUP_TIMEOUT_S):
-    t0 = time.time()
-    while time.time() - t0 < timeout:
+def _drain_output(proc: subprocess.Popen, tail: deque):
+    """Keeps reading the child's stdout so a full pipe never blocks Streamlit.
+    Only the last lines are kept, for the startup-failure message."""
+    for line in iter(proc.stdout.readline, b""):
+        tail.append(line.decode(errors="ignore"))
+
+def wait_for_server(port: int, proc: subprocess.Popen | None = None, timeout=STARTUP_TIMEOUT_S):
+    """Polls the port with backoff (25 ms up to 400 ms); gives up early if proc exits."""
+    t0 = time.monotonic()
+    delay = 0.025
+    while time.monotonic() - t0 < timeout:
         if port_in_use(port):
             return True
-        time.sleep(0.2)
+        if proc is not None and proc.poll() is not None:
+            return False  # Streamlit died during startup, no point waiting out the timeout
+        time.sleep(delay)
+        delay = min(delay * 1.5, 0.4)
     return False
 
 def main():
     # Single-instance lock
-    lock_socket = acquire_single_instance_lock(LOCK_PORT)
+    instance_lock = acquire_single_instance_lock(LOCK_PORT)
 
-    # Resolve app path; when frozen, copy to a temp dir so Streamlit can write
+    # Resolve app path; when frozen and the bundle is read-only, mirror it into a temp dir so Streamlit can write
     app_path = _resource_path(APP_REL_PATH)
     if getattr(sys, "_MEIPASS", None):
-        tmpdir = Path(tempfile.mkdtemp(prefix="st_app_"))
         root = APP_REL_PATH.parts[0]  # "app"
-        shutil.copytree(_resource_path(Path(root)), tmpdir / root, dirs_exist_ok=True)
-        app_path = tmpdir / APP_REL_PATH
+        src = _resource_path(Path(root))
+        if not os.access(src, os.W_OK):
+            tmpdir = Path(tempfile.mkdtemp(prefix="st_app_"))
+            _link_tree(src, tmpdir / root)
+            app_path = tmpdir / APP_REL_PATH
 
     # Don’t start a second Streamlit if it’s already up (e.g., previous crash left it running)
+    output_tail = deque(maxlen=200)
     if not port_in_use(STREAMLIT_PORT):
         proc = launch_streamlit(app_path, STREAMLIT_PORT)
+        threading.Thread(target=_drain_output, args=(proc, output_tail), daemon=True).start()
     else:
         proc = None  # reuse existing server
 
-    ok = wait_for_server(STREAMLIT_PORT)
-    if not ok:
-        if proc is not None:
-            try:
-                out = proc.stdout.read().decode(errors="ignore")
-                print(out)
-            except Exception:
-                pass
-        raise SystemExit("Streamlit server failed to start on time.")
-
-    # Create a single native window and hand over control
+    # Create a single native window right away so the webview engine starts up
+    # while Streamlit is still booting; the app URL is loaded once the port answers
     import webview
-    window = webview.create_window(WINDOW_TITLE, f"http://127.0.0.1:{STREAMLIT_PORT}",
+    window = webview.create_window(WINDOW_TITLE, html=LOADING_HTML,
                                    width=WINDOW_W, height=WINDOW_H)
+    startup = {}
+
+    def load_when_ready():
+        # runs on pywebview's worker thread once the GUI loop is up
+        ok = wait_for_server(STREAMLIT_PORT, proc)
+        startup["ok"] = ok
+        startup["exit_code"] = proc.poll() if proc is not None else None
+        if ok:
+            window.load_url(f"http://127.0.0.1:{STREAMLIT_PORT}")
+        else:
+            window.destroy()
+
     try:
         # Start GUI loop; no debug, no http_server
-        webview.start()
+        webview.start(load_when_ready)
     finally:
         # Clean shutdown of the child server if we launched it
         if proc and proc.poll() is None:
@@ -100,10 +157,20 @@ def main():
                 proc.wait(timeout=5)
             except Exception:
                 proc.kill()
-        try:
-            lock_socket.close()
-        except Exception:
-            pass
+        if isinstance(instance_lock, socket.socket):
+            try:
+                instance_lock.close()
+            except Exception:
+                pass
+        # the Windows mutex handle is released by the OS when the process exits
+
+    # no "ok" entry means the user closed the window before the server answered
+    if startup.get("ok") is False:
+        if output_tail:
+            print("".join(output_tail))
+        if startup["exit_code"] is not None:
+            raise SystemExit(f"Streamlit server exited during startup (code {startup['exit_code']}).")
+        raise SystemExit("Streamlit server failed to start on time.")
 
 if __name__ == "__main__":
     # macOS / PyInstaller safety to avoid re-exec loops